@@ -0,0 +1,118 @@
+"""
+Read/write split between the primary database and its read replicas.
+
+Writes, and every read by default, go to the primary. Views mixing in
+`ReplicaReadMixin` run their list/retrieve reads on a random replica. A user
+whose request wrote something is pinned to the primary for
+`REPLICA_PIN_TIMEOUT` seconds so they always read their own writes.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+_read_from_replica = ContextVar("read_from_replica", default=False)
+
+
+def _pin_key(user_id) -> str:
+    return f"db:pinned:{user_id}"
+
+
+def pin_to_primary(user_id) -> None:
+    cache.set(_pin_key(user_id), True, settings.REPLICA_PIN_TIMEOUT)
+
+
+async def apin_to_primary(user_id) -> None:
+    await cache.aset(_pin_key(user_id), True, settings.REPLICA_PIN_TIMEOUT)
+
+
+def is_pinned_to_primary(user_id) -> bool:
+    return cache.get(_pin_key(user_id), False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and _read_from_replica.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaReadMixin:
+    """Serve the `replica_actions` of a DRF view from a read replica"""
+
+    replica_actions = ("list", "retrieve")
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        self._replica_token = None
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method in SAFE_METHODS
+            and getattr(self, "action", None) in self.replica_actions
+            and not (
+                request.user.is_authenticated
+                and is_pinned_to_primary(request.user.id)
+            )
+        ):
+            self._replica_token = _read_from_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if getattr(self, "_replica_token", None) is not None:
+            _read_from_replica.reset(self._replica_token)
+            self._replica_token = None
+
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class PinPrimaryAfterWriteMiddleware:
+    """Pin users to the primary after any successful unsafe request"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        response = self.get_response(request)
+        if self._wrote(request, response):
+            pin_to_primary(request.user.id)
+
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self._wrote(request, response):
+            await apin_to_primary(request.user.id)
+
+        return response
+
+    @staticmethod
+    def _wrote(request, response) -> bool:
+        # DRF copies the user it authenticated back onto the HttpRequest.
+        user = getattr(request, "user", None)
+        return bool(
+            settings.DATABASE_REPLICAS
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and user is not None
+            and user.is_authenticated
+        )
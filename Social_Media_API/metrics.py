@@ -0,0 +1,294 @@
+"""
+Per-request performance instrumentation.
+
+`MetricsMiddleware` times every request and attributes the database queries
+spent inside it to the view that handled it, labelled like
+`PostViewSet.like`, along with the time spent in `timed_serialization`
+blocks: the JSON renderer, the `.values()` row payloads and the views
+building serializer data themselves. Each response gets a `Server-Timing`
+header, the process keeps Prometheus histograms served by `metrics_view`,
+and a sample of queries slower than `METRICS["SLOW_QUERY_MS"]` is logged
+with their view.
+
+Histograms live in process memory, so each worker exposes its own.
+"""
+import hmac
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+slow_query_logger = logging.getLogger("Social_Media_API.metrics.slow_queries")
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    __slots__ = ("view", "queries", "db_time", "serialize_time", "depth")
+
+    def __init__(self):
+        self.view = "unresolved"
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.depth = 0
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        with self._lock:
+            counts, total = self._series.get(
+                labels, ([0] * (len(self.buckets) + 1), 0.0)
+            )
+            counts[bisect_left(self.buckets, value)] += 1
+            self._series[labels] = (counts, total + value)
+
+    def expose(self) -> list:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = sorted(
+                (labels, list(counts), total)
+                for labels, (counts, total) in self._series.items()
+            )
+
+        for (view, method), counts, total in series:
+            labels = f'view="{view}",method="{method}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+
+        return lines
+
+
+HISTOGRAMS = {
+    "duration": Histogram(
+        "http_request_duration_seconds",
+        "Wall time spent handling the request.",
+        SECONDS_BUCKETS,
+    ),
+    "queries": Histogram(
+        "http_request_db_queries",
+        "Database queries issued while handling the request.",
+        QUERY_COUNT_BUCKETS,
+    ),
+    "db_time": Histogram(
+        "http_request_db_duration_seconds",
+        "Time spent in database queries while handling the request.",
+        SECONDS_BUCKETS,
+    ),
+    "serialize_time": Histogram(
+        "http_request_serialize_duration_seconds",
+        "Time spent building and rendering the response payload.",
+        SECONDS_BUCKETS,
+    ),
+    "size": Histogram(
+        "http_response_size_bytes",
+        "Size of the response body.",
+        BYTES_BUCKETS,
+    ),
+}
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper charging queries to the current request"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.db_time += duration
+
+        config = settings.METRICS
+        if (
+            duration * 1000 >= config["SLOW_QUERY_MS"]
+            and random.random() < config["SLOW_QUERY_SAMPLE_RATE"]
+        ):
+            slow_query_logger.warning(
+                "%.1f ms in %s: %s",
+                duration * 1000,
+                metrics.view,
+                sql,
+                extra={"view": metrics.view, "duration": duration},
+            )
+
+
+def record_queries() -> ExitStack:
+    """
+    Wrap the calling thread's connections with `record_query` until the
+    returned stack is closed.
+    """
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(record_query))
+
+    return stack
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Charge the enclosed block to the current request's serialize time:
+    building response rows or serializer data, and rendering them. Nested
+    blocks are only counted once.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+
+    metrics.depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.depth -= 1
+        if not metrics.depth:
+            metrics.serialize_time += time.perf_counter() - started
+
+
+def view_label(view_func, method: str) -> str:
+    """`PostViewSet.like` for DRF viewsets, the view's name otherwise"""
+    actions = getattr(view_func, "actions", None)
+    view_class = getattr(view_func, "cls", None)
+    if actions and view_class is not None:
+        return f"{view_class.__name__}.{actions.get(method, method)}"
+
+    if view_class is not None and view_class.__name__ != "WrappedAPIView":
+        return view_class.__name__
+
+    view_class = getattr(view_func, "view_class", None)
+    if view_class is not None:
+        return view_class.__name__
+
+    return getattr(view_func, "__name__", type(view_func).__name__)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics, token, started = self._start()
+        try:
+            with record_queries():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self._finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics, token, started = self._start()
+        try:
+            # The async ORM queries from the request's sync thread, so
+            # wrap the connections of that thread.
+            recording = await sync_to_async(record_queries)()
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(recording.close)()
+        finally:
+            _current.reset(token)
+
+        return self._finish(request, response, metrics, started)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view = view_label(view_func, request.method.lower())
+
+    @staticmethod
+    def _start():
+        metrics = RequestMetrics()
+        return metrics, _current.set(metrics), time.perf_counter()
+
+    @staticmethod
+    def _finish(request, response, metrics, started):
+        duration = time.perf_counter() - started
+        labels = (metrics.view, request.method)
+
+        HISTOGRAMS["duration"].observe(labels, duration)
+        HISTOGRAMS["queries"].observe(labels, metrics.queries)
+        HISTOGRAMS["db_time"].observe(labels, metrics.db_time)
+        HISTOGRAMS["serialize_time"].observe(labels, metrics.serialize_time)
+        if not response.streaming:
+            HISTOGRAMS["size"].observe(labels, len(response.content))
+
+        response["Server-Timing"] = ", ".join(
+            (
+                f'db;dur={metrics.db_time * 1000:.1f};'
+                f'desc="{metrics.queries} queries"',
+                f"serialize;dur={metrics.serialize_time * 1000:.1f}",
+                f"total;dur={duration * 1000:.1f}",
+            )
+        )
+        return response
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of the request histograms, for bearers of
+    `METRICS["TOKEN"]`, or for anyone with DEBUG when no token is set.
+    """
+    token = settings.METRICS["TOKEN"]
+    if token:
+        allowed = hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+    else:
+        allowed = settings.DEBUG
+    if not allowed:
+        return HttpResponseForbidden()
+
+    lines = []
+    for histogram in HISTOGRAMS.values():
+        lines += histogram.expose()
+
+    return HttpResponse(
+        "\n".join(lines) + "\n",
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/4.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -20,14 +21,20 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = (
-    "django-insecure--t5&^s%hazd@#5lxi4#j0ae8ng@42110^bz*siud!r)mji$rzv"
+SECRET_KEY = os.environ.get(
+    "DJANGO_SECRET_KEY",
+    "django-insecure--t5&^s%hazd@#5lxi4#j0ae8ng@42110^bz*siud!r)mji$rzv",
 )
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DEBUG also keeps every executed query in memory.
+DEBUG = os.environ.get("DJANGO_DEBUG", "true").lower() in ("1", "true", "yes")
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host
+    for host in os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(",")
+    if host
+]
 
 
 # Application definition
@@ -44,14 +51,18 @@ INSTALLED_APPS = [
     "drf_spectacular",
     "social_media",
     "user",
+    "tasks",
 ]
 
 MIDDLEWARE = [
+    "Social_Media_API.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "Social_Media_API.db_routing.PinPrimaryAfterWriteMiddleware",
+    "Social_Media_API.throttling.RateLimitHeadersMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -80,6 +91,10 @@ WSGI_APPLICATION = "Social_Media_API.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Setting POSTGRES_DB switches to PostgreSQL with persistent connections.
+# POSTGRES_REPLICA_HOSTS (comma separated) adds read replicas, which serve
+# the list/retrieve reads of views using ReplicaReadMixin.
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
@@ -87,6 +102,94 @@ DATABASES = {
     }
 }
 
+if os.environ.get("POSTGRES_DB"):
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ["POSTGRES_DB"],
+        "USER": os.environ.get("POSTGRES_USER", "postgres"),
+        "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+        "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+        "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        "CONN_MAX_AGE": int(os.environ.get("POSTGRES_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
+        # Server-side cursors back QuerySet.iterator(), but do not survive
+        # a transaction-pooling proxy such as PgBouncer.
+        "DISABLE_SERVER_SIDE_CURSORS": os.environ.get(
+            "POSTGRES_TRANSACTION_POOLING", ""
+        ).lower()
+        in ("1", "true", "yes"),
+    }
+
+    for index, host in enumerate(
+        host
+        for host in os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",")
+        if host
+    ):
+        DATABASES[f"replica_{index}"] = {
+            **DATABASES["default"],
+            "HOST": host,
+            "TEST": {"MIRROR": "default"},
+        }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+
+DATABASE_ROUTERS = ["Social_Media_API.db_routing.ReplicaRouter"]
+
+# How long reads stay on the primary after a user's own write (seconds),
+# should exceed the replication lag.
+REPLICA_PIN_TIMEOUT = int(os.environ.get("REPLICA_PIN_TIMEOUT", "5"))
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Any server speaking the Redis protocol can be plugged in through REDIS_URL.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "social-media-api",
+    }
+}
+
+if os.environ.get("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["REDIS_URL"],
+    }
+
+# Serialized payload cache for read-heavy endpoints (seconds)
+PAYLOAD_CACHE = {
+    "ALIAS": "default",
+    "TIMEOUT": 300,
+    "STALE_TIMEOUT": 30,
+    "LOCK_TIMEOUT": 10,
+}
+
+# Request instrumentation: Server-Timing headers, Prometheus histograms at
+# /metrics (behind METRICS_TOKEN, or open with DEBUG when it is unset) and
+# a sampled slow-query log.
+METRICS = {
+    "TOKEN": os.environ.get("METRICS_TOKEN"),
+    "SLOW_QUERY_MS": int(os.environ.get("SLOW_QUERY_MS", "100")),
+    "SLOW_QUERY_SAMPLE_RATE": float(
+        os.environ.get("SLOW_QUERY_SAMPLE_RATE", "1.0")
+    ),
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "Social_Media_API.metrics.slow_queries": {
+            "handlers": ["console"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -111,6 +214,14 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 MEDIA_URL = "/media/"
 
+# Resized copies of uploaded images, built off the request by the task
+# queue.
+IMAGE_RENDITIONS = {
+    "FORMAT": "WEBP",
+    "QUALITY": 80,
+    "SIZES": {"thumbnail": 150, "small": 480, "medium": 1080},
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -135,11 +246,40 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # Only views with a `throttle_scope` are limited, see
+    # Social_Media_API/throttling.py.
+    "DEFAULT_THROTTLE_CLASSES": (
+        "Social_Media_API.throttling.UserScopedThrottle",
+        "Social_Media_API.throttling.IPScopedThrottle",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "like": "120/min",
+        "like_ip": "600/min",
+        "comment": "20/min",
+        "comment_ip": "100/min",
+        "follow": "60/min",
+        "follow_ip": "300/min",
+        "register_ip": "20/hour",
+        "post_batch": "60/hour",
+        "export": "10/hour",
+    },
 }
 
+# Throttle counters must be shared by every worker: use a Redis-backed
+# alias in production, the local memory cache only limits per process.
+THROTTLE_CACHE = "default"
+
+# Opt-in orjson rendering (`pip install orjson`), falling back to the stdlib
+# encoder when the package is missing.
+if os.environ.get("DJANGO_FAST_JSON", "").lower() in ("1", "true", "yes"):
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = (
+        "Social_Media_API.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    )
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Your Project API",
     "DESCRIPTION": "Your project description",
@@ -147,7 +287,39 @@ SPECTACULAR_SETTINGS = {
     "SERVE_INCLUDE_SCHEMA": False,
 }
 
+# Per-process LRU caches of validated access tokens and of the user
+# snapshots behind them, see user/authentication.py. TIMEOUT bounds how
+# long other processes may miss a change to a user's is_staff/is_active.
+AUTH_CACHE = {"SIZE": 10_000, "TIMEOUT": 30}
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=10),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
 }
+
+# Background tasks, run by `manage.py run_tasks`. EAGER runs them inline
+# when they are queued instead. Failed tasks are retried after
+# RETRY_DELAY * 2 ** (attempt - 1) seconds. A task still running after
+# LEASE_TIMEOUT seconds is taken for lost with its worker and retried.
+# Tasks due for over STALE_AFTER seconds are logged once per process, as
+# a hint that no worker is running.
+TASKS = {
+    "EAGER": os.environ.get("TASKS_EAGER", "").lower() in ("1", "true", "yes"),
+    "RETRY_DELAY": 5,
+    "LEASE_TIMEOUT": 600,
+    "POLL_INTERVAL": 1.0,
+    "STALE_AFTER": 300,
+}
+
+# Home timeline: posts of authors with more followers than the fan-out limit
+# are merged in at read time instead of being written to every timeline.
+TIMELINE_FANOUT_LIMIT = 10_000
+
+TIMELINE_BACKFILL_SIZE = 200
+
+# Rows fetched per server-side cursor round trip by the account export.
+EXPORT_CHUNK_SIZE = 2000
+
+# Latest comments embedded in a post detail, the rest are paginated
+# under /posts/<id>/comments/.
+POST_DETAIL_COMMENT_LIMIT = 10
@@ -0,0 +1,163 @@
+"""
+Rate limits for the write hot paths.
+
+A view opts in with a `throttle_scope` (an `@action` keyword for viewset
+actions, `throttle_scope()` for `@api_view` functions). The scope's rates
+come from REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]: `<scope>` limits each
+user, or each client IP when anonymous, and `<scope>_ip` each client IP.
+A scope without a configured rate is not limited.
+
+Counters live in the THROTTLE_CACHE alias and only move through atomic
+`add` / `incr`, so limits hold across worker processes sharing the cache.
+"""
+import abc
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate: str) -> tuple:
+    """`"30/min"` -> (30 requests, per 60 seconds)"""
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+def throttle_scope(scope: str):
+    """Set the throttle scope of an `@api_view`, decorating it from above"""
+
+    def decorator(view):
+        view.cls.throttle_scope = scope
+        return view
+
+    return decorator
+
+
+class ScopedWindowThrottle(BaseThrottle, abc.ABC):
+    """
+    Sliding window limit of a view's `throttle_scope`.
+
+    Requests are counted in fixed windows of the rate's period, and the
+    previous window weighs in by how much of it the sliding window still
+    overlaps. A token bucket would need an atomic read-modify-write that
+    the cache API lacks; this smooths bursts over window edges much the
+    same way with increments only. Rejected requests count too, so a
+    client that keeps hammering stays limited.
+    """
+
+    rate_suffix = ""
+    timer = time.time
+
+    @abc.abstractmethod
+    def get_client_ident(self, request) -> str:
+        """Who the counters of this throttle are kept for"""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, "throttle_scope", None)
+        if scope is None:
+            return True
+
+        scope += self.rate_suffix
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+
+        self.limit, self.duration = parse_rate(rate)
+        window, self.elapsed = divmod(self.timer(), self.duration)
+        key = f"throttle:{scope}:{self.get_client_ident(request)}"
+        self.current = self._increment(f"{key}:{int(window)}")
+        self.previous = self._cache().get(f"{key}:{int(window) - 1}", 0)
+
+        used = self.previous * (1 - self.elapsed / self.duration)
+        used += self.current
+        remaining = max(0, int(self.limit - used))
+        self._record(request, remaining, self.duration - self.elapsed)
+        return used <= self.limit
+
+    def wait(self):
+        # The next request must fit beside the current window's count and
+        # the decaying share of the previous one.
+        room = self.limit - self.current - 1
+        if room < 0 or not self.previous:
+            return self.duration - self.elapsed
+
+        decayed_at = self.duration * (1 - room / self.previous)
+        return max(decayed_at - self.elapsed, 0)
+
+    @staticmethod
+    def _cache():
+        return caches[settings.THROTTLE_CACHE]
+
+    def _increment(self, key) -> int:
+        cache = self._cache()
+        cache.add(key, 0, timeout=2 * self.duration)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Evicted between the add and the incr.
+            cache.set(key, 1, timeout=2 * self.duration)
+            return 1
+
+    def _record(self, request, remaining: int, reset: float) -> None:
+        """Keep the tightest limit for the RateLimit-* response headers"""
+        http_request = request._request
+        state = getattr(http_request, "rate_limit", None)
+        if state is None or remaining < state[1]:
+            http_request.rate_limit = (self.limit, remaining, int(reset) + 1)
+
+
+class UserScopedThrottle(ScopedWindowThrottle):
+    """`<scope>` rate per user, per client IP for anonymous requests"""
+
+    def get_client_ident(self, request) -> str:
+        user = request.user
+        if user and user.is_authenticated:
+            return f"user:{user.pk}"
+
+        return f"ip:{self.get_ident(request)}"
+
+
+class IPScopedThrottle(ScopedWindowThrottle):
+    """`<scope>_ip` rate per client IP, whoever is authenticated"""
+
+    rate_suffix = "_ip"
+
+    def get_client_ident(self, request) -> str:
+        return self.get_ident(request)
+
+
+class RateLimitHeadersMiddleware:
+    """Report the tightest limit a throttle checked in RateLimit-* headers"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        return self._add_headers(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._add_headers(request, await self.get_response(request))
+
+    @staticmethod
+    def _add_headers(request, response):
+        state = getattr(request, "rate_limit", None)
+        if state is not None:
+            limit, remaining, reset = state
+            response["RateLimit-Limit"] = str(limit)
+            response["RateLimit-Remaining"] = str(remaining)
+            response["RateLimit-Reset"] = str(reset)
+
+        return response
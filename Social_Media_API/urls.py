@@ -8,12 +8,15 @@ from drf_spectacular.views import (
     SpectacularRedocView,
 )
 
+from Social_Media_API.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("user/", include("user.urls", namespace="user")),
     path(
         "social_media/", include("social_media.urls", namespace="social-media")
     ),
+    path("metrics", metrics_view, name="metrics"),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
         "api/doc/swagger/",
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SocialMediaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'social_media'
+
+    def ready(self):
+        from social_media import signals  # noqa: F401
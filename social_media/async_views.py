@@ -0,0 +1,196 @@
+"""
+Native async versions of the hot read endpoints, for ASGI deployments.
+
+They return the same payloads as their DRF counterparts and reuse their
+querysets, pagination and serializers, but await every database round-trip,
+so a worker keeps serving other requests while one waits on the database or
+on a slow client. Serializers only ever see prefetched data.
+"""
+import asyncio
+import functools
+
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    MethodNotAllowed,
+    NotAuthenticated,
+    NotFound,
+)
+from rest_framework.request import Request
+
+from Social_Media_API.metrics import timed_serialization
+from social_media.cache import (
+    aget_or_compute,
+    post_detail_key,
+    post_namespace,
+)
+from social_media.conditional import (
+    apage_validators,
+    instance_etag,
+    is_conditional,
+    not_modified_response,
+    paginator_etag,
+    set_validator_headers,
+)
+from social_media.likes import user_likes
+from social_media.models import Comment, Hashtag, Post, PostHashtag
+from social_media.pagination import PostCursorPagination
+from social_media.serializers import PostDetailSerializer, PostListSerializer
+from user.authentication import AsyncJWTAuthentication
+
+authentication = AsyncJWTAuthentication()
+
+
+def async_api_view(view):
+    """
+    Allow only authenticated GET requests to an async view, and render
+    `APIException`s the way DRF does.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            if request.method != "GET":
+                raise MethodNotAllowed(request.method)
+
+            authenticated = await authentication.aauthenticate(request)
+            if authenticated is None:
+                raise NotAuthenticated()
+
+            drf_request = Request(request)
+            drf_request.user, drf_request.auth = authenticated
+            return await view(drf_request, *args, **kwargs)
+        except APIException as exc:
+            return _exception_response(request, exc)
+
+    return wrapper
+
+
+def _exception_response(request, exc):
+    detail = exc.detail
+    if not isinstance(detail, (list, dict)):
+        detail = {"detail": detail}
+
+    response = JsonResponse(detail, status=exc.status_code, safe=False)
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        response["WWW-Authenticate"] = authentication.authenticate_header(
+            request
+        )
+
+    return response
+
+
+def _attach_prefetched(instance, name, objects):
+    """Seed `instance.<name>.all()` the way `prefetch_related` does"""
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = objects
+    queryset._prefetch_done = True
+    instance.__dict__.setdefault("_prefetched_objects_cache", {})[
+        name
+    ] = queryset
+
+
+async def _post_hashtags(post_ids) -> dict:
+    hashtags = {post_id: [] for post_id in post_ids}
+    async for link in PostHashtag.objects.filter(
+        post_id__in=post_ids
+    ).select_related("hashtag"):
+        hashtags[link.post_id].append(link.hashtag)
+
+    return hashtags
+
+
+async def post_page_response(request, queryset):
+    """
+    One keyset page of `queryset` rendered with `PostListSerializer`, or a
+    304 when the page the client holds is still current.
+    """
+    if is_conditional(request):
+        validators = await apage_validators(
+            request, PostCursorPagination(), queryset
+        )
+        response = validators and not_modified_response(request, validators)
+        if response is not None:
+            return set_validator_headers(response, validators)
+
+    paginator = PostCursorPagination()
+    posts = await paginator.apaginate_queryset(
+        queryset.with_liked_by_me(request.user), request
+    )
+
+    hashtags = await _post_hashtags([post.id for post in posts])
+    for post in posts:
+        _attach_prefetched(post, "hashtags", hashtags[post.id])
+
+    with timed_serialization():
+        serializer = PostListSerializer(
+            posts, many=True, context={"request": request}
+        )
+        response = JsonResponse(
+            paginator.get_paginated_response(serializer.data).data
+        )
+    return set_validator_headers(
+        response, (paginator_etag(request, paginator), None)
+    )
+
+
+async def _post_detail_entry(request, pk):
+    """Fetch a post and everything it embeds concurrently"""
+    post, hashtags, comments = await asyncio.gather(
+        Post.objects.filter(pk=pk).afirst(),
+        _list(Hashtag.objects.filter(posts=pk)),
+        _list(
+            Comment.objects.filter(post_id=pk).order_by("-created_at", "-id")[
+                : settings.POST_DETAIL_COMMENT_LIMIT
+            ]
+        ),
+    )
+    if post is None:
+        raise NotFound()
+
+    _attach_prefetched(post, "hashtags", hashtags)
+    post.latest_comments = comments
+
+    with timed_serialization():
+        data = PostDetailSerializer(post, context={"request": request}).data
+    return {
+        "validators": (instance_etag(post), post.updated_at),
+        "data": data,
+    }
+
+
+async def _list(queryset) -> list:
+    return [item async for item in queryset]
+
+
+@async_api_view
+async def post_detail(request, pk):
+    """Async `PostViewSet.retrieve`, sharing its payload cache"""
+    entry = await aget_or_compute(
+        post_namespace(pk),
+        post_detail_key(
+            request, PostDetailSerializer.requested_fields(request)
+        ),
+        lambda: _post_detail_entry(request, pk),
+    )
+    validators = entry["validators"]
+    response = not_modified_response(request, validators)
+    if response is None:
+        data = await _liked_by_me(request, pk, entry["data"])
+        with timed_serialization():
+            response = JsonResponse(data)
+    return set_validator_headers(response, validators)
+
+
+async def _liked_by_me(request, pk, data: dict) -> dict:
+    """Async `liked_by_me` of social_media/views.py"""
+    fields = PostDetailSerializer.requested_fields(request)
+    if fields is not None and "liked_by_me" not in fields:
+        return data
+
+    return {
+        **data,
+        "liked_by_me": await user_likes(request.user, [pk]).aexists(),
+    }
@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+KEY_PREFIX = "payload"
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _cache():
+    return caches[settings.PAYLOAD_CACHE["ALIAS"]]
+
+
+def _version_key(namespace: str) -> str:
+    return f"{KEY_PREFIX}:{namespace}:version"
+
+
+def _version(cache, namespace: str) -> int:
+    """
+    Current version of a namespace. A missing counter is seeded with the
+    clock so entries written under an evicted counter are never reused.
+    """
+    version_key = _version_key(namespace)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, time.time_ns(), timeout=None)
+        version = cache.get(version_key)
+
+    return version
+
+
+async def _aversion(cache, namespace: str) -> int:
+    version_key = _version_key(namespace)
+    version = await cache.aget(version_key)
+    if version is None:
+        await cache.aadd(version_key, time.time_ns(), timeout=None)
+        version = await cache.aget(version_key)
+
+    return version
+
+
+def invalidate(*namespaces: str) -> None:
+    """Orphan every payload cached under `namespaces`"""
+    cache = _cache()
+    for namespace in namespaces:
+        try:
+            cache.incr(_version_key(namespace))
+        except ValueError:
+            pass
+
+
+def post_namespace(post_id) -> str:
+    return f"post:{post_id}"
+
+
+def post_detail_key(request, fields=None) -> str:
+    """Cache key of a post detail payload, per host and sparse fieldset"""
+    key = f"detail:{request.get_host()}"
+    if fields:
+        key += f":{','.join(sorted(fields))}"
+
+    return key
+
+
+def get_or_compute(namespace: str, key: str, compute, timeout=None):
+    """
+    Return the payload cached under `namespace`/`key`, computing it on miss.
+
+    Entries outlive their `timeout` by STALE_TIMEOUT seconds. Once stale, a
+    single caller takes the recompute lock while the others keep serving
+    the stale payload; on a cold miss the others wait for that one caller
+    instead of recomputing the same payload concurrently.
+    """
+    config = settings.PAYLOAD_CACHE
+    timeout = timeout or config["TIMEOUT"]
+    cache = _cache()
+    cache_key = f"{KEY_PREFIX}:{namespace}:{_version(cache, namespace)}:{key}"
+    lock_key = f"{cache_key}:lock"
+
+    entry = cache.get(cache_key)
+    if entry is not None:
+        fresh_until, payload = entry
+        if time.time() < fresh_until:
+            return payload
+        if not cache.add(lock_key, 1, config["LOCK_TIMEOUT"]):
+            return payload
+    elif not cache.add(lock_key, 1, config["LOCK_TIMEOUT"]):
+        entry = _wait_for(cache, cache_key, lock_key, config["LOCK_TIMEOUT"])
+        if entry is not None:
+            return entry[1]
+        return compute()
+
+    try:
+        payload = compute()
+        cache.set(
+            cache_key,
+            (time.time() + timeout, payload),
+            timeout + config["STALE_TIMEOUT"],
+        )
+    finally:
+        cache.delete(lock_key)
+
+    return payload
+
+
+def _wait_for(cache, cache_key: str, lock_key: str, max_wait: float):
+    """Poll until the lock holder stores the entry or gives up"""
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(cache_key)
+        if entry is not None or cache.get(lock_key) is None:
+            return entry
+
+    return None
+
+
+async def aget_or_compute(namespace: str, key: str, compute, timeout=None):
+    """`get_or_compute` for async views, awaiting the `compute` coroutine"""
+    config = settings.PAYLOAD_CACHE
+    timeout = timeout or config["TIMEOUT"]
+    cache = _cache()
+    version = await _aversion(cache, namespace)
+    cache_key = f"{KEY_PREFIX}:{namespace}:{version}:{key}"
+    lock_key = f"{cache_key}:lock"
+
+    entry = await cache.aget(cache_key)
+    if entry is not None:
+        fresh_until, payload = entry
+        if time.time() < fresh_until:
+            return payload
+        if not await cache.aadd(lock_key, 1, config["LOCK_TIMEOUT"]):
+            return payload
+    elif not await cache.aadd(lock_key, 1, config["LOCK_TIMEOUT"]):
+        entry = await _await_for(
+            cache, cache_key, lock_key, config["LOCK_TIMEOUT"]
+        )
+        if entry is not None:
+            return entry[1]
+        return await compute()
+
+    try:
+        payload = await compute()
+        await cache.aset(
+            cache_key,
+            (time.time() + timeout, payload),
+            timeout + config["STALE_TIMEOUT"],
+        )
+    finally:
+        await cache.adelete(lock_key)
+
+    return payload
+
+
+async def _await_for(cache, cache_key: str, lock_key: str, max_wait: float):
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        entry = await cache.aget(cache_key)
+        if entry is not None or await cache.aget(lock_key) is None:
+            return entry
+
+    return None
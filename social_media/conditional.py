@@ -0,0 +1,187 @@
+"""
+Conditional GET for DRF views.
+
+A request carrying `If-None-Match` / `If-Modified-Since` is validated by a
+single lightweight query, e.g. a post's `updated_at`, and answered with a
+304 before the view runs its real queries or serializes anything. Full
+responses derive the same `ETag` / `Last-Modified` from the data they
+already fetched, so unconditional requests cost no extra query.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+CONDITIONAL_HEADERS = ("HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE")
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False)
+    return quote_etag(digest.hexdigest())
+
+
+def instance_etag(instance) -> str:
+    return make_etag(instance._meta.label, instance.pk, instance.updated_at)
+
+
+def instance_validators(queryset, pk):
+    """Validators of the row `pk` of `queryset`, from its `updated_at`"""
+    try:
+        instance = queryset.filter(pk=pk).only("updated_at").first()
+    except (TypeError, ValueError):
+        return None
+
+    if instance is None:
+        return None
+
+    return instance_etag(instance), instance.updated_at
+
+
+def paginator_etag(request, paginator) -> str:
+    """
+    ETag of the keyset page `paginator` just produced, from the id and
+    `updated_at` of its rows, dicts or instances. Pages are per user: they
+    say `liked_by_me`.
+    """
+    return make_etag(
+        request.user.id,
+        request.get_full_path(),
+        [
+            (row["id"], row["updated_at"])
+            if isinstance(row, dict)
+            else (row.id, row.updated_at)
+            for row in paginator.page
+        ],
+        paginator.has_next,
+        paginator.has_previous,
+    )
+
+
+def page_etag(view) -> str:
+    return paginator_etag(view.request, view.paginator)
+
+
+def page_validators(view, queryset):
+    """
+    Validators of the requested page of `queryset`. There is no
+    Last-Modified: deleting a row does not move the latest `updated_at`.
+    """
+    paginator = view.paginator
+    rows = paginator._page_queryset(
+        queryset.values("id", "updated_at"), view.request, view
+    )
+    if rows is None:
+        return None
+
+    paginator._set_page(list(rows))
+    return page_etag(view), None
+
+
+async def apage_validators(request, paginator, queryset):
+    """`page_validators` for async views, fetching with the async ORM"""
+    rows = paginator._page_queryset(
+        queryset.values("id", "updated_at"), request, None
+    )
+    if rows is None:
+        return None
+
+    paginator._set_page([row async for row in rows])
+    return paginator_etag(request, paginator), None
+
+
+def is_conditional(request) -> bool:
+    return request.method in ("GET", "HEAD") and any(
+        header in request.META for header in CONDITIONAL_HEADERS
+    )
+
+
+def not_modified_response(request, validators):
+    """The 304 (or 412) answering `request` given `validators`, else None"""
+    etag, last_modified = validators
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=(
+            int(last_modified.timestamp()) if last_modified else None
+        ),
+    )
+
+
+def set_validator_headers(response, validators):
+    etag, last_modified = validators
+    if etag:
+        response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # Representations may be per user: let only the client keep them,
+    # and have it revalidate every time.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    Views implement `<action>_validators()`, or `get_validators()` for views
+    without actions, returning an `(etag, last_modified)` pair of which
+    either may be None, or None when the request cannot be validated.
+    Handlers set `self.conditional_validators` for their full responses.
+    """
+
+    def get_validators(self):
+        action = getattr(self, "action", None)
+        method = getattr(self, f"{action}_validators", None)
+        return method() if method is not None else None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.conditional_validators = None
+        if not is_conditional(request):
+            return
+
+        validators = self.get_validators()
+        if validators is None:
+            return
+
+        response = not_modified_response(request, validators)
+        if response is not None:
+            self.conditional_validators = validators
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        validators = getattr(self, "conditional_validators", None)
+        if validators is None or response.status_code not in (200, 304):
+            return response
+
+        return set_validator_headers(response, validators)
+
+
+class ConditionalPageMixin(ConditionalGetMixin):
+    """Conditional GET for keyset pages of rows carrying `updated_at`"""
+
+    def list_validators(self):
+        return page_validators(self, self.get_queryset())
+
+    def get_validators(self):
+        if getattr(self, "action", "list") == "list":
+            return self.list_validators()
+
+        return super().get_validators()
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        self.conditional_validators = page_etag(self), None
+        return response
@@ -0,0 +1,130 @@
+import re
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db.models import Exists, F, OuterRef, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from social_media.models import Hashtag, HashtagUsage, PostHashtag
+from tasks.queue import task
+
+HASHTAG_RE = re.compile(r"#(\w+)")
+HASHTAG_MAX_LENGTH = Hashtag._meta.get_field("name").max_length
+MAX_FILTER_HASHTAGS = 10
+
+
+def extract_hashtags(text: str) -> list:
+    """Lowercased hashtag names in `text`, in order of first appearance"""
+    names = {}
+    for name in HASHTAG_RE.findall(text):
+        if len(name) <= HASHTAG_MAX_LENGTH:
+            names.setdefault(name.lower(), None)
+
+    return list(names)
+
+
+def upsert_hashtags(names) -> list:
+    """Fetch the hashtags called `names`, creating the missing ones"""
+    if not names:
+        return []
+
+    Hashtag.objects.bulk_create(
+        [Hashtag(name=name) for name in names], ignore_conflicts=True
+    )
+    return list(Hashtag.objects.filter(name__in=names))
+
+
+def resolve_hashtag_ids(tokens) -> tuple:
+    """
+    Hashtag ids for a mix of ids and names, names resolved in one query.
+    Also tells whether any of the names does not exist.
+    """
+    ids = {int(token) for token in tokens if token.isdigit()}
+    names = {
+        token.lstrip("#").lower() for token in tokens if not token.isdigit()
+    }
+    found = {}
+    if names:
+        found = dict(
+            Hashtag.objects.filter(name__in=names).values_list("name", "id")
+        )
+
+    return ids | set(found.values()), len(found) < len(names)
+
+
+def filter_by_hashtags(queryset, tokens, match_all: bool):
+    """
+    Posts tagged with all (or any) of the hashtags in `tokens`.
+
+    Each hashtag is an EXISTS probe on the (hashtag, post) index, so no
+    join fans out the post rows and no DISTINCT is needed.
+    """
+    tokens = [token.strip() for token in tokens if token.strip()]
+    ids, missing = resolve_hashtag_ids(tokens[:MAX_FILTER_HASHTAGS])
+    if not ids or (match_all and missing):
+        return queryset.none()
+
+    if not match_all:
+        return queryset.filter(
+            Exists(
+                PostHashtag.objects.filter(
+                    post_id=OuterRef("pk"), hashtag_id__in=ids
+                )
+            )
+        )
+
+    condition = Q()
+    for hashtag_id in ids:
+        condition &= Exists(
+            PostHashtag.objects.filter(
+                post_id=OuterRef("pk"), hashtag_id=hashtag_id
+            )
+        )
+
+    return queryset.filter(condition)
+
+
+def usage_bucket(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+@task(dedup=False)
+def record_usage(hashtag_ids, moment=None) -> None:
+    """
+    Count one use per occurrence of a hashtag in `hashtag_ids` in the hour
+    of `moment`, a datetime or, once queued, its ISO format, else now.
+    """
+    if not hashtag_ids:
+        return
+
+    if isinstance(moment, str):
+        moment = parse_datetime(moment)
+    bucket = usage_bucket(moment or timezone.now())
+    uses = Counter(hashtag_ids)
+    HashtagUsage.objects.bulk_create(
+        [
+            HashtagUsage(hashtag_id=hashtag_id, bucket=bucket)
+            for hashtag_id in uses
+        ],
+        ignore_conflicts=True,
+    )
+    by_count = defaultdict(list)
+    for hashtag_id, count in uses.items():
+        by_count[count].append(hashtag_id)
+    for count, ids in by_count.items():
+        HashtagUsage.objects.filter(hashtag_id__in=ids, bucket=bucket).update(
+            count=F("count") + count
+        )
+
+
+def trending_hashtags(hours: int, limit: int) -> list:
+    """Most used hashtags over the last `hours` hourly buckets"""
+    since = usage_bucket(timezone.now()) - timedelta(hours=hours - 1)
+    return list(
+        HashtagUsage.objects.filter(bucket__gte=since)
+        .values("hashtag_id", "hashtag__name")
+        .annotate(uses=Sum("count"))
+        .order_by("-uses", "hashtag_id")
+        .values("hashtag_id", "hashtag__name", "uses")[:limit]
+    )
@@ -0,0 +1,105 @@
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from tasks.queue import task
+
+
+def build_renditions(name: str, storage=default_storage) -> dict:
+    """
+    Decode the stored image `name` and write one resized copy per configured
+    size next to it. Renditions are re-encoded without EXIF, after the EXIF
+    orientation has been applied to the pixels.
+    """
+    config = settings.IMAGE_RENDITIONS
+    image_format = config["FORMAT"].upper()
+    directory, filename = os.path.split(name)
+    stem, _ = os.path.splitext(filename)
+
+    with storage.open(name) as file, Image.open(file) as original:
+        image = ImageOps.exif_transpose(original)
+        if image_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+
+        renditions = {
+            "source": name,
+            "width": image.width,
+            "height": image.height,
+            "sizes": {},
+        }
+        for label, edge in config["SIZES"].items():
+            rendition = image.copy()
+            rendition.thumbnail((edge, edge))
+            buffer = BytesIO()
+            rendition.save(
+                buffer,
+                format=image_format,
+                quality=config["QUALITY"],
+                exif=b"",
+            )
+            path = os.path.join(
+                directory,
+                "renditions",
+                f"{stem}-{label}.{image_format.lower()}",
+            )
+            renditions["sizes"][label] = {
+                "name": storage.save(path, ContentFile(buffer.getvalue())),
+                "width": rendition.width,
+                "height": rendition.height,
+            }
+
+    return renditions
+
+
+def delete_renditions(renditions: dict, storage=default_storage) -> None:
+    for rendition in renditions.get("sizes", {}).values():
+        storage.delete(rendition["name"])
+
+
+@task(priority=-10)
+def process_renditions(
+    model_label: str, pk, image_field: str, renditions_field: str
+):
+    """Build renditions for the current image of one model instance"""
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+
+    image = getattr(instance, image_field)
+    previous = getattr(instance, renditions_field)
+    if not image or previous.get("source") == image.name:
+        return
+
+    setattr(instance, renditions_field, build_renditions(image.name))
+    instance.save(update_fields=[renditions_field, "updated_at"])
+    delete_renditions(previous)
+
+
+def schedule_renditions(instance, image_field: str, renditions_field: str):
+    """
+    Queue rendition building for a newly uploaded image, so the request
+    that stored it does not wait for Pillow.
+    """
+    image = getattr(instance, image_field)
+    renditions = getattr(instance, renditions_field)
+
+    if not image:
+        if renditions:
+            type(instance).objects.filter(pk=instance.pk).update(
+                **{renditions_field: {}}
+            )
+            delete_renditions(renditions)
+        return
+
+    if renditions.get("source") == image.name:
+        return
+
+    process_renditions.delay(
+        instance._meta.label, instance.pk, image_field, renditions_field
+    )
@@ -0,0 +1,169 @@
+"""
+Bulk post import, shared by the `bulk_import_posts` command and the batch
+create endpoint.
+
+Rows are validated and written in chunks. Per chunk, one query resolves
+the users, one checks the titles, two upsert the hashtags, and the posts
+and their hashtag links are each written with a single `bulk_create`.
+Invalid rows are reported with their errors and skipped, the valid rows
+of the chunk are still imported.
+"""
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from social_media.hashtags import (
+    extract_hashtags,
+    record_usage,
+    upsert_hashtags,
+)
+from social_media.models import Post, PostHashtag, title_hash
+from social_media.serializers import DUPLICATE_TITLE, PostImportSerializer
+from social_media.timeline import fan_out_post
+
+IMPORT_CHUNK_SIZE = 1000
+
+
+@dataclass
+class ImportResult:
+    created: list = field(default_factory=list)
+    # (row number, errors) pairs.
+    errors: list = field(default_factory=list)
+
+
+def _resolve_users(rows, result) -> list:
+    """Keep the rows whose `user` id or email exists, as user ids"""
+    tokens = {data.get("user", "").strip() for _, data in rows}
+    ids = {int(token) for token in tokens if token.isdigit()}
+    emails = {token for token in tokens if token and not token.isdigit()}
+    users = {}
+    for user_id, email in get_user_model().objects.filter(
+        Q(id__in=ids) | Q(email__in=emails)
+    ).values_list("id", "email"):
+        users[str(user_id)] = users[email] = user_id
+
+    resolved = []
+    for number, data in rows:
+        token = data.get("user", "").strip()
+        if token in users:
+            resolved.append((number, {**data, "user_id": users[token]}))
+        else:
+            message = "Unknown user." if token else "This field is required."
+            result.errors.append((number, {"user": [message]}))
+
+    return resolved
+
+
+def _unique_titles(rows) -> tuple:
+    """
+    Split off the rows whose title its user already has, in the database
+    or in an earlier row
+    """
+    for _, data in rows:
+        data["title_hash"] = title_hash(data["title"])
+    taken = set(
+        Post.objects.filter(
+            user_id__in={data["user_id"] for _, data in rows},
+            title_hash__in={data["title_hash"] for _, data in rows},
+        ).values_list("user_id", "title_hash")
+    )
+    unique, errors = [], []
+    for number, data in rows:
+        key = (data["user_id"], data["title_hash"])
+        if key in taken:
+            errors.append((number, {"title": [DUPLICATE_TITLE]}))
+        else:
+            taken.add(key)
+            unique.append((number, data))
+
+    return unique, errors
+
+
+def _insert(rows, fan_out: bool) -> list:
+    names = {}
+    for _, data in rows:
+        row_names = dict.fromkeys(data["hashtags"])
+        row_names.update(dict.fromkeys(extract_hashtags(data["content"])))
+        data["hashtags"] = list(row_names)
+        names.update(row_names)
+    hashtag_ids = {
+        hashtag.name: hashtag.id for hashtag in upsert_hashtags(list(names))
+    }
+
+    with transaction.atomic():
+        posts = Post.objects.bulk_create(
+            [
+                Post(
+                    user_id=data["user_id"],
+                    title=data["title"],
+                    title_hash=data["title_hash"],
+                    content=data["content"],
+                )
+                for _, data in rows
+            ]
+        )
+        links = [
+            PostHashtag(post_id=post.id, hashtag_id=hashtag_ids[name])
+            for post, (_, data) in zip(posts, rows)
+            for name in data["hashtags"]
+        ]
+        PostHashtag.objects.bulk_create(links)
+        record_usage.delay(
+            [link.hashtag_id for link in links], timezone.now()
+        )
+        if fan_out:
+            fan_out_post.delay_many([(post.id,) for post in posts])
+
+    return [post.id for post in posts]
+
+
+def import_chunk(rows, user=None, fan_out: bool = True) -> ImportResult:
+    """
+    Import `rows`, (row number, data) pairs. With `user`, every post is
+    created for that user, else for the `user` of its row. Data that is a
+    ValidationError, e.g. for a line that did not parse, is reported as is.
+    """
+    result = ImportResult()
+    serializer = PostImportSerializer()
+    valid = []
+    for number, data in rows:
+        try:
+            if isinstance(data, ValidationError):
+                raise data
+            valid.append((number, serializer.run_validation(data)))
+        except ValidationError as exc:
+            result.errors.append((number, exc.detail))
+
+    if user is not None:
+        valid = [
+            (number, {**data, "user_id": user.id}) for number, data in valid
+        ]
+    else:
+        valid = _resolve_users(valid, result)
+
+    for attempt in range(2):
+        unique, duplicates = _unique_titles(valid)
+        try:
+            result.created = _insert(unique, fan_out) if unique else []
+        except IntegrityError:
+            # A concurrent writer took one of the titles: check them again.
+            if attempt:
+                raise
+            continue
+        break
+
+    result.errors += duplicates
+    result.errors.sort(key=lambda error: error[0])
+    return result
+
+
+def import_posts(rows, chunk_size: int = IMPORT_CHUNK_SIZE, **kwargs):
+    """Import (row number, data) pairs, yielding one result per chunk"""
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield import_chunk(chunk, **kwargs)
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from social_media.cache import invalidate, post_namespace
+from social_media.models import Post
+
+Like = Post.liked_by.through
+
+
+def _lock_user(user) -> None:
+    """Serialize the like writes of one user so the diffs below are exact"""
+    list(
+        get_user_model()
+        .objects.select_for_update()
+        .filter(id=user.id)
+        .values_list("id")
+    )
+
+
+def like_posts(user, post_ids) -> list:
+    """Like every post in `post_ids` and return the ids newly liked"""
+    with transaction.atomic():
+        _lock_user(user)
+        new_ids = list(
+            Post.objects.filter(id__in=post_ids)
+            .exclude(liked_by=user)
+            .values_list("id", flat=True)
+        )
+        Like.objects.bulk_create(
+            [Like(post_id=post_id, user_id=user.id) for post_id in new_ids],
+            ignore_conflicts=True,
+        )
+        Post.objects.filter(id__in=new_ids).update(
+            like_count=F("like_count") + 1, updated_at=timezone.now()
+        )
+
+    invalidate(*(post_namespace(post_id) for post_id in new_ids))
+    return new_ids
+
+
+def unlike_posts(user, post_ids) -> list:
+    """Unlike every post in `post_ids` and return the ids newly unliked"""
+    with transaction.atomic():
+        _lock_user(user)
+        likes = Like.objects.filter(user_id=user.id, post_id__in=post_ids)
+        removed_ids = list(likes.values_list("post_id", flat=True))
+        likes.delete()
+        Post.objects.filter(id__in=removed_ids).update(
+            like_count=F("like_count") - 1, updated_at=timezone.now()
+        )
+
+    invalidate(*(post_namespace(post_id) for post_id in removed_ids))
+    return removed_ids
+
+
+def user_likes(user, post_ids):
+    """The likes of `user` among `post_ids`"""
+    return Like.objects.filter(user_id=user.id, post_id__in=post_ids)
+
+
+def recount_likes(post_ids) -> None:
+    """Recompute `like_count` from the through table for `post_ids`"""
+    likes = (
+        Like.objects.filter(post_id=OuterRef("pk"))
+        .values("post_id")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    Post.objects.filter(id__in=post_ids).update(
+        like_count=Coalesce(Subquery(likes), 0), updated_at=timezone.now()
+    )
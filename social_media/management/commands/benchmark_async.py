@@ -0,0 +1,127 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from social_media.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (WSGI) and native async (ASGI) read endpoints "
+        "in-process, under the same number of concurrent requests"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="Id of the user to authenticate as (default: first user)",
+        )
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=20)
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by("id")
+        if options["user"]:
+            users = users.filter(id=options["user"])
+        user = users.first()
+        post = Post.objects.order_by("-id").first()
+        if user is None or post is None:
+            raise CommandError("Benchmarking needs at least a user and a post")
+
+        headers = {
+            "Authorization": f"Bearer {AccessToken.for_user(user)}",
+        }
+        routes = [
+            ("user posts", "user:me-posts", "user:me-posts-async", ()),
+            ("liked posts", "user:liked-posts", "user:liked-posts-async", ()),
+            (
+                "following posts",
+                "user:following-posts",
+                "user:following-posts-async",
+                (),
+            ),
+            (
+                "post detail",
+                "social_media:post-detail",
+                "social_media:post-detail-async",
+                (post.id,),
+            ),
+        ]
+
+        # Accept the test client's host and stop recording queries.
+        setup_test_environment(debug=False)
+
+        self.stdout.write(
+            f"{'endpoint':<16} {'mode':<6} {'req/s':>8} "
+            f"{'p50 ms':>8} {'p95 ms':>8}"
+        )
+        for label, sync_name, async_name, args in routes:
+            results, elapsed = self._run_sync(
+                reverse(sync_name, args=args), headers, options
+            )
+            self._report(label, "wsgi", results, elapsed)
+
+            results, elapsed = asyncio.run(
+                self._run_async(
+                    reverse(async_name, args=args), headers, options
+                )
+            )
+            self._report(label, "asgi", results, elapsed)
+
+    @staticmethod
+    def _run_sync(url, headers, options):
+        client = Client()
+
+        def timed(_):
+            started = time.perf_counter()
+            response = client.get(url, headers=headers)
+            response.content
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options["concurrency"]) as executor:
+            results = list(executor.map(timed, range(options["requests"])))
+
+        return results, time.perf_counter() - started
+
+    @staticmethod
+    async def _run_async(url, headers, options):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(options["concurrency"])
+
+        async def timed():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(timed() for _ in range(options["requests"]))
+        )
+
+        return results, time.perf_counter() - started
+
+    def _report(self, label, mode, results, elapsed):
+        failed = [status for _, status in results if status != 200]
+        if failed:
+            raise CommandError(
+                f"{label} ({mode}): {len(failed)} requests failed, "
+                f"first status {failed[0]}"
+            )
+
+        timings = sorted(duration * 1000 for duration, _ in results)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f"{label:<16} {mode:<6} {len(timings) / elapsed:>8.1f} "
+            f"{statistics.median(timings):>8.1f} {p95:>8.1f}"
+        )
@@ -0,0 +1,332 @@
+import json
+import statistics
+import subprocess
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+)
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from social_media.likes import Like
+from social_media.models import Comment, Hashtag, Post
+
+NAMESPACES = ("user", "social-media")
+METHODS = ("get", "post", "put", "patch", "delete")
+# GET actions that write, benchmarked with the writes.
+MUTATING_GETS = ("social-media:post-like", "social-media:post-unlike")
+# Routes whose URL argument names another kind of object than the route.
+ARGUMENT_KINDS = {"social-media:comment_create": "post"}
+
+
+def iter_routes(patterns, namespace=None):
+    """(namespace, URLPattern) for every route below `patterns`"""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(
+                pattern.url_patterns, pattern.namespace or namespace
+            )
+        elif isinstance(pattern, URLPattern):
+            yield namespace, pattern
+
+
+def route_methods(callback) -> list:
+    """The HTTP methods, lowercase, the view of a route handles"""
+    actions = getattr(callback, "actions", None)
+    if actions is not None:
+        return [method for method in METHODS if method in actions]
+
+    view_class = getattr(callback, "cls", None) or getattr(
+        callback, "view_class", None
+    )
+    if view_class is not None:
+        return [method for method in METHODS if hasattr(view_class, method)]
+
+    return ["get"]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure latency, query count and response size of every route "
+        "of the user and social_media apps, as diffable JSON. Writes run "
+        "in a transaction rolled back after each request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="User to authenticate as (default: the one following most)",
+        )
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Clear the cache before every request",
+        )
+        parser.add_argument(
+            "--output", help="Write the JSON report here instead of stdout"
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.order_by("-following_count", "id")
+        if options["user"]:
+            users = users.filter(id=options["user"])
+        user = users.first()
+        post = Post.objects.order_by("-like_count", "-id").first()
+        if user is None or post is None:
+            raise CommandError("Benchmarking needs at least a user and a post")
+
+        self.samples = {
+            "user": User.objects.order_by("-follower_count", "id")
+            .values_list("id", flat=True)
+            .first(),
+            "post": post.id,
+            "comment": Comment.objects.filter(user=user)
+            .values_list("id", flat=True)
+            .first(),
+            "hashtag": Hashtag.objects.values_list("id", flat=True).first(),
+        }
+        some_user_ids = User.objects.values_list("id", flat=True)[:20]
+        self.query_params = {
+            "social-media:post-search": {"q": post.title.split()[0]},
+            "user:user-typeahead": {"q": user.email[:3]},
+            "user:user-is-following": {
+                "ids": ",".join(str(user_id) for user_id in some_user_ids)
+            },
+        }
+        token = AccessToken.for_user(user)
+        self.headers = {"Authorization": f"Bearer {token}"}
+        own_post = Post.objects.filter(user=user).values_list("id", flat=True)
+        self.write_samples = {**self.samples, "post": own_post.first()}
+        self.bodies = {
+            ("social-media:post-list", "post"): {
+                "title": "Benchmark",
+                "content": "Benchmark post #benchmark",
+            },
+            ("social-media:post-detail", "put"): {
+                "title": "Benchmark",
+                "content": "Benchmark post",
+            },
+            ("social-media:post-detail", "patch"): {"title": "Benchmark"},
+            ("social-media:post-bulk-like", "post"): {
+                "posts": list(
+                    Post.objects.values_list("id", flat=True)[:100]
+                )
+            },
+            ("social-media:post-bulk-create", "post"): {
+                "posts": [
+                    {"title": "Benchmark", "content": f"Benchmark {n}"}
+                    for n in range(20)
+                ]
+            },
+            ("social-media:comment_create", "post"): {"content": "Benchmark"},
+            ("social-media:comment-detail", "put"): {"content": "Benchmark"},
+            ("social-media:comment-detail", "patch"): {
+                "content": "Benchmark"
+            },
+            ("social-media:hashtag-list", "post"): {"name": "benchmark"},
+            ("social-media:hashtag-detail", "put"): {"name": "benchmark"},
+            ("social-media:hashtag-detail", "patch"): {"name": "benchmark"},
+            ("user:create", "post"): {
+                "email": "benchmark@example.com",
+                "password": "benchmark",
+            },
+            ("user:manage", "put"): {
+                "email": user.email,
+                "password": "benchmark",
+            },
+            ("user:manage", "patch"): {"email": user.email},
+            ("user:bulk-follow", "post"): {
+                "users": [
+                    user_id for user_id in some_user_ids if user_id != user.id
+                ]
+            },
+            ("user:follow", "post"): {},
+            ("user:unfollow", "post"): {},
+            ("user:token_refresh", "post"): {
+                "refresh": str(RefreshToken.for_user(user))
+            },
+            ("user:token_verify", "post"): {"token": str(token)},
+        }
+        self.client = Client()
+        self.options = options
+
+        # Accept the test client's host and stop recording queries.
+        setup_test_environment(debug=False)
+
+        reads, writes = [], []
+        for namespace, pattern in iter_routes(get_resolver().url_patterns):
+            if namespace not in NAMESPACES or pattern.name is None:
+                continue
+            if "format" in pattern.pattern.regex.groupindex:
+                continue
+
+            name = f"{namespace}:{pattern.name}"
+            for method in route_methods(pattern.callback):
+                if method == "get" and name not in MUTATING_GETS:
+                    reads.append((name, method, pattern))
+                else:
+                    writes.append((name, method, pattern))
+
+        # Reads go first: a write pins its user to the primary database.
+        routes = {}
+        for name, method, pattern in reads:
+            routes.setdefault(name, {})[method.upper()] = self._benchmark(
+                name, method, pattern
+            )
+            self.stderr.write(f"{method.upper()} {name}: {routes[name]}")
+
+        # Writes are measured rather than rejected by the rate limits.
+        rest_framework = {
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {},
+        }
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            for name, method, pattern in writes:
+                result = self._benchmark(name, method, pattern)
+                routes.setdefault(name, {})[method.upper()] = result
+                self.stderr.write(f"{method.upper()} {name}: {result}")
+
+        report = {
+            "meta": {
+                "commit": self._commit(),
+                "created_at": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "user": user.id,
+                "iterations": options["iterations"],
+                "cold": options["cold"],
+                "dataset": {
+                    "users": User.objects.count(),
+                    "posts": Post.objects.count(),
+                    "comments": Comment.objects.count(),
+                    "hashtags": Hashtag.objects.count(),
+                    "likes": Like.objects.count(),
+                },
+            },
+            "routes": routes,
+        }
+        output = json.dumps(report, indent=2, sort_keys=True)
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+    def _benchmark(self, name, method, pattern):
+        write = method != "get" or name in MUTATING_GETS
+        samples = self.write_samples if write else self.samples
+        kwargs = {}
+        for argument in pattern.pattern.regex.groupindex:
+            kind = "user" if argument == "user_id" else pattern.name
+            kind = ARGUMENT_KINDS.get(name, kind)
+            kind = kind.replace("_", "-").split("-")[0]
+            if samples.get(kind) is None:
+                return {"skipped": f"no sample for {argument}"}
+            kwargs[argument] = samples[kind]
+
+        if method == "get":
+            data = self.query_params.get(name, {})
+        elif method == "delete":
+            data = None
+        elif (name, method) in self.bodies:
+            data = self.bodies[name, method]
+        else:
+            return {"skipped": "no sample body"}
+
+        url = reverse(name, kwargs=kwargs)
+        for _ in range(self.options["warmup"]):
+            self._measure(method, url, data, write)
+
+        timings, queries, sizes, statuses = [], [], [], []
+        for _ in range(self.options["iterations"]):
+            if self.options["cold"]:
+                cache.clear()
+            response, size, timing, query_count = self._measure(
+                method, url, data, write
+            )
+            timings.append(timing)
+            queries.append(query_count)
+            sizes.append(size)
+            statuses.append(response.status_code)
+
+        timings.sort()
+        return {
+            "url": url,
+            "status": statistics.mode(statuses),
+            "p50_ms": round(statistics.median(timings), 2),
+            "p99_ms": round(percentile(timings, 0.99), 2),
+            "queries": max(queries),
+            "bytes": int(statistics.median(sizes)),
+        }
+
+    def _measure(self, method, url, data, write) -> tuple:
+        """
+        One request as (response, size, milliseconds, queries). Writes run
+        in a transaction rolled back afterwards, so every iteration sees the
+        same data; their query counts include the savepoints the views'
+        own atomic blocks turn into.
+        """
+        with transaction.atomic() if write else nullcontext():
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response, size = self._request(method, url, data)
+                timing = (time.perf_counter() - started) * 1000
+            if write:
+                transaction.set_rollback(True)
+
+        return response, size, timing, len(context.captured_queries)
+
+    def _request(self, method, url, data):
+        if method == "get":
+            response = self.client.get(url, data, headers=self.headers)
+        elif data is None:
+            response = self.client.generic(
+                method.upper(), url, headers=self.headers
+            )
+        else:
+            response = self.client.generic(
+                method.upper(),
+                url,
+                json.dumps(data),
+                content_type="application/json",
+                headers=self.headers,
+            )
+        if response.streaming:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+        else:
+            size = len(response.content)
+
+        return response, size
+
+    @staticmethod
+    def _commit():
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "HEAD"],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
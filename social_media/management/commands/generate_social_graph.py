@@ -0,0 +1,316 @@
+import random
+import secrets
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from social_media.likes import Like, recount_likes
+from social_media.models import (
+    Comment,
+    Hashtag,
+    HashtagUsage,
+    Post,
+    PostHashtag,
+    title_hash,
+)
+from user.graph import recount_follows
+from user.models import Follow
+
+PASSWORD = "synthetic-password"
+
+# Exponents of the power laws: Zipf over popularity ranks, Pareto over how
+# many accounts each user follows.
+POPULARITY_EXPONENT = 1.1
+FOLLOWING_PARETO_ALPHA = 2.0
+
+
+def zipf_cum_weights(size: int, exponent: float = POPULARITY_EXPONENT):
+    return list(accumulate(1 / rank**exponent for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic social graph with power-law followers, "
+        "skewed likes and hashtags, for load testing"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1_000)
+        parser.add_argument(
+            "--avg-following",
+            type=int,
+            default=50,
+            help="Mean number of accounts each user follows",
+        )
+        parser.add_argument("--posts", type=int, default=20_000)
+        parser.add_argument("--likes", type=int, default=200_000)
+        parser.add_argument("--comments", type=int, default=50_000)
+        parser.add_argument("--hashtags", type=int, default=500)
+        parser.add_argument("--max-hashtags-per-post", type=int, default=3)
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Spread post creation times over this many days",
+        )
+        parser.add_argument("--batch-size", type=int, default=5_000)
+        parser.add_argument("--seed", type=int)
+        parser.add_argument(
+            "--prefix",
+            help="Prefix of generated emails and titles (default: random)",
+        )
+        parser.add_argument(
+            "--skip-timelines",
+            action="store_true",
+            help="Do not materialize the home timelines afterwards",
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.prefix = options["prefix"] or f"synth{secrets.token_hex(3)}"
+        self.now = timezone.now()
+
+        users = self._users(options["users"])
+        self._follows(users, options["avg_following"])
+        hashtags = self._hashtags(options["hashtags"])
+        posts = self._posts(users, options["posts"], options["days"])
+        self._post_hashtags(posts, hashtags, options["max_hashtags_per_post"])
+        self._likes(users, posts, options["likes"])
+        self._comments(users, posts, options["comments"])
+        self._derived(users, posts, hashtags)
+
+        if not options["skip_timelines"]:
+            self.stdout.write("Materializing timelines...")
+            call_command(
+                "rebuild_timelines", user_ids=users, stdout=self.stdout
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {len(users)} users ({self.prefix}*@example.com, "
+                f"password {PASSWORD!r}) and {len(posts)} posts"
+            )
+        )
+
+    def _insert(self, model, rows, ignore_conflicts=False):
+        """bulk_create an iterable of instances batch by batch"""
+        # Conflicting rows are skipped but still returned by bulk_create.
+        before = model.objects.count()
+        created = []
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                created += self._flush(model, batch, ignore_conflicts)
+                batch = []
+
+        created += self._flush(model, batch, ignore_conflicts)
+        self.stdout.write(
+            f"  {model.__name__}: {model.objects.count() - before}"
+        )
+        return created
+
+    def _insert_backdated(self, model, rows) -> list:
+        """
+        `_insert` (instance, created_at) pairs, then write back the
+        `created_at` values `auto_now_add` replaced on insert.
+        """
+        timestamps = []
+
+        def instances():
+            for instance, created_at in rows:
+                timestamps.append(created_at)
+                yield instance
+
+        created = self._insert(model, instances())
+        for instance, created_at in zip(created, timestamps):
+            instance.created_at = created_at
+        model.objects.bulk_update(
+            created, ["created_at"], batch_size=self.batch_size
+        )
+        return created
+
+    @staticmethod
+    def _flush(model, batch, ignore_conflicts):
+        if not batch:
+            return []
+
+        with transaction.atomic():
+            return model.objects.bulk_create(
+                batch, ignore_conflicts=ignore_conflicts
+            )
+
+    def _users(self, count) -> list:
+        password = make_password(PASSWORD)
+        users = self._insert(
+            get_user_model(),
+            (
+                get_user_model()(
+                    email=f"{self.prefix}-{i}@example.com", password=password
+                )
+                for i in range(count)
+            ),
+        )
+        return [user.id for user in users]
+
+    def _follows(self, user_ids, avg_following):
+        """
+        Out-degrees follow a Pareto law and followees are drawn by a Zipf
+        popularity rank, so a few accounts collect most of the followers.
+        """
+        popular = self.random.sample(user_ids, len(user_ids))
+        cum_weights = zipf_cum_weights(len(popular))
+        minimum = avg_following * (FOLLOWING_PARETO_ALPHA - 1)
+        minimum /= FOLLOWING_PARETO_ALPHA
+
+        def edges():
+            for follower_id in user_ids:
+                wanted = int(
+                    minimum * self.random.paretovariate(FOLLOWING_PARETO_ALPHA)
+                )
+                wanted = min(wanted, len(user_ids) - 1)
+                followees = set()
+                for _ in range(wanted * 3):
+                    if len(followees) >= wanted:
+                        break
+                    (followee_id,) = self.random.choices(
+                        popular, cum_weights=cum_weights
+                    )
+                    if followee_id != follower_id:
+                        followees.add(followee_id)
+
+                for followee_id in followees:
+                    yield Follow(
+                        followee_id=followee_id, follower_id=follower_id
+                    )
+
+        self._insert(Follow, edges(), ignore_conflicts=True)
+
+    def _hashtags(self, count) -> list:
+        hashtags = self._insert(
+            Hashtag,
+            (Hashtag(name=f"{self.prefix}_tag{i}") for i in range(count)),
+        )
+        return [hashtag.id for hashtag in hashtags]
+
+    def _posts(self, user_ids, count, days) -> list:
+        """Authors are Zipf distributed too: a few users post most"""
+        authors = self.random.choices(
+            self.random.sample(user_ids, len(user_ids)),
+            cum_weights=zipf_cum_weights(len(user_ids)),
+            k=count,
+        )
+        span = timedelta(days=days).total_seconds()
+
+        posts = self._insert_backdated(
+            Post,
+            (
+                (
+                    Post(
+                        title=f"{self.prefix} post {i}",
+                        title_hash=title_hash(f"{self.prefix} post {i}"),
+                        content=f"Synthetic post {i} by user {author_id}",
+                        user_id=author_id,
+                    ),
+                    self.now - timedelta(seconds=self.random.uniform(0, span)),
+                )
+                for i, author_id in enumerate(authors)
+            ),
+        )
+
+        return [(post.id, post.created_at) for post in posts]
+
+    def _post_hashtags(self, posts, hashtag_ids, max_per_post):
+        if not hashtag_ids:
+            return
+
+        cum_weights = zipf_cum_weights(len(hashtag_ids))
+
+        def links():
+            for post_id, _ in posts:
+                tags = self.random.choices(
+                    hashtag_ids,
+                    cum_weights=cum_weights,
+                    k=self.random.randint(0, max_per_post),
+                )
+                for hashtag_id in set(tags):
+                    yield PostHashtag(post_id=post_id, hashtag_id=hashtag_id)
+
+        self._insert(PostHashtag, links())
+
+    def _likes(self, user_ids, posts, count):
+        """Likes land on posts by a Zipf rank: a few posts go viral"""
+        post_ids = self.random.sample(
+            [post_id for post_id, _ in posts], len(posts)
+        )
+        cum_weights = zipf_cum_weights(len(post_ids))
+
+        def likes():
+            for _ in range(count):
+                (post_id,) = self.random.choices(
+                    post_ids, cum_weights=cum_weights
+                )
+                yield Like(
+                    post_id=post_id, user_id=self.random.choice(user_ids)
+                )
+
+        self._insert(Like, likes(), ignore_conflicts=True)
+
+    def _comments(self, user_ids, posts, count):
+        cum_weights = zipf_cum_weights(len(posts))
+        shuffled = self.random.sample(posts, len(posts))
+
+        def comments():
+            for _ in range(count):
+                ((post_id, created_at),) = self.random.choices(
+                    shuffled, cum_weights=cum_weights
+                )
+                delay = (self.now - created_at).total_seconds()
+                yield (
+                    Comment(
+                        post_id=post_id,
+                        user_id=self.random.choice(user_ids),
+                        content="Synthetic comment",
+                    ),
+                    created_at
+                    + timedelta(seconds=self.random.uniform(0, delay)),
+                )
+
+        self._insert_backdated(Comment, comments())
+
+    def _derived(self, user_ids, posts, hashtag_ids):
+        """Rebuild the counters bulk_create skipped the signals for"""
+        self.stdout.write("Recounting denormalized counters...")
+        for start in range(0, len(user_ids), self.batch_size):
+            recount_follows(user_ids[start : start + self.batch_size])
+
+        post_ids = [post_id for post_id, _ in posts]
+        for start in range(0, len(post_ids), self.batch_size):
+            recount_likes(post_ids[start : start + self.batch_size])
+
+        usage = (
+            PostHashtag.objects.filter(hashtag_id__in=hashtag_ids)
+            .annotate(bucket=TruncHour("post__created_at"))
+            .values("hashtag_id", "bucket")
+            .annotate(uses=Count("id"))
+        )
+        self._insert(
+            HashtagUsage,
+            (
+                HashtagUsage(
+                    hashtag_id=row["hashtag_id"],
+                    bucket=row["bucket"],
+                    count=row["uses"],
+                )
+                for row in list(usage)
+            ),
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from social_media.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over post titles and content"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Database to rebuild the index on",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        rebuild_search_index(connection)
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt search index on {connection.alias}")
+        )
@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from social_media.models import TimelineEntry
+from social_media.timeline import backfill_timeline
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized home timelines from the follow graph"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Only rebuild the timeline of this user id (repeatable)",
+        )
+
+    def handle(self, *args, **options):
+        owners = get_user_model().objects.order_by("id")
+        if options["user_ids"]:
+            owners = owners.filter(id__in=options["user_ids"])
+
+        rebuilt = 0
+        for owner in owners.iterator(chunk_size=500):
+            TimelineEntry.objects.filter(owner=owner).delete()
+            backfill_timeline(
+                owner.id, owner.following.values_list("id", flat=True)
+            )
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} timelines"))
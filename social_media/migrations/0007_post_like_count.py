@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 17:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_likes(apps, schema_editor):
+    Post = apps.get_model("social_media", "Post")
+    likes = (
+        Post.liked_by.through.objects.filter(post_id=OuterRef("pk"))
+        .values("post_id")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    Post.objects.update(like_count=Coalesce(Subquery(likes), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0006_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_likes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from social_media.search import (
+    install_search_index,
+    rebuild_search_index,
+    uninstall_search_index,
+)
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+    rebuild_search_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0008_comment_created_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-18 17:53
+
+from django.db import migrations, models
+
+from social_media.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0009_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_renditions',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.RunPython(
+            reinstall_search_index, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-18 17:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0010_post_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HashtagUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('hashtag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='social_media.hashtag')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='hashtagusage',
+            index=models.Index(fields=['bucket'], name='hashtag_usage_bucket_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='hashtagusage',
+            constraint=models.UniqueConstraint(fields=('hashtag', 'bucket'), name='hashtag_usage_unique'),
+        ),
+    ]
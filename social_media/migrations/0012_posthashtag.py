@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 17:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """
+    Turn the auto-created post/hashtag through table into an explicit model
+    without touching the existing table, then index it hashtag-first.
+    """
+
+    dependencies = [
+        ('social_media', '0011_hashtagusage'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='PostHashtag',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('hashtag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='social_media.hashtag')),
+                        ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='social_media.post')),
+                    ],
+                    options={
+                        'db_table': 'social_media_post_hashtags',
+                        'unique_together': {('post', 'hashtag')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='post',
+                    name='hashtags',
+                    field=models.ManyToManyField(related_name='posts', through='social_media.PostHashtag', to='social_media.hashtag'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='posthashtag',
+            index=models.Index(fields=['hashtag', 'post'], name='post_hashtag_tag_post_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 18:28
+
+from django.db import migrations, models
+
+from social_media.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_media', '0013_user_created_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hashtag',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(
+            reinstall_search_index, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.db import migrations, models
+
+from social_media.models import title_hash
+from social_media.search import install_search_index
+
+BATCH_SIZE = 2000
+
+
+def fill_title_hashes(apps, schema_editor):
+    Post = apps.get_model("social_media", "Post")
+    posts = Post.objects.filter(title_hash__isnull=True).only("id", "title")
+    batch = []
+    for post in posts.iterator(chunk_size=BATCH_SIZE):
+        post.title_hash = title_hash(post.title)
+        batch.append(post)
+        if len(batch) >= BATCH_SIZE:
+            Post.objects.bulk_update(batch, ["title_hash"])
+            batch = []
+
+    Post.objects.bulk_update(batch, ["title_hash"])
+
+
+def reinstall_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("social_media", "0014_updated_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="post",
+            name="title",
+            field=models.CharField(max_length=65),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="title_hash",
+            field=models.BigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_title_hashes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="post",
+            name="title_hash",
+            field=models.BigIntegerField(editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name="post",
+            constraint=models.UniqueConstraint(
+                fields=("user", "title_hash"),
+                name="post_user_title_hash_unique",
+            ),
+        ),
+        migrations.RunPython(
+            reinstall_search_index, migrations.RunPython.noop
+        ),
+    ]
@@ -1,18 +1,44 @@
+import hashlib
 import os
 import uuid
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 
 
 class Hashtag(models.Model):
     name = models.CharField(max_length=65, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return self.name
 
 
+class HashtagUsage(models.Model):
+    """How many times a hashtag was attached to posts within one hour"""
+
+    hashtag = models.ForeignKey(
+        Hashtag, on_delete=models.CASCADE, related_name="usage"
+    )
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hashtag", "bucket"], name="hashtag_usage_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["bucket"], name="hashtag_usage_bucket_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.hashtag_id} @ {self.bucket}: {self.count}"
+
+
 def post_image_file_path(instance, filename):
     _, extension = os.path.splitext(filename)
     return os.path.join(
@@ -21,14 +47,43 @@ def post_image_file_path(instance, filename):
     )
 
 
+def title_hash(title: str) -> int:
+    """Signed 64-bit digest of a post title, as stored in `title_hash`"""
+    digest = hashlib.blake2b(title.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class PostQuerySet(models.QuerySet):
+    def touch(self) -> int:
+        """Bump `updated_at` when something embedded in the posts changed"""
+        return self.update(updated_at=timezone.now())
+
+    def with_liked_by_me(self, user):
+        """Annotate whether `user` likes each post, without loading likes"""
+        return self.annotate(
+            liked_by_me=models.Exists(
+                Post.liked_by.through.objects.filter(
+                    post_id=models.OuterRef("pk"), user_id=user.id
+                )
+            )
+        )
+
+
 class Post(models.Model):
-    title = models.CharField(max_length=65, unique=True)
+    title = models.CharField(max_length=65)
+    # Titles are unique per user, enforced on this digest: the index holds
+    # 8-byte integers instead of the titles. Set on save, writers that
+    # bypass it (bulk_create) must fill it in with `title_hash()`.
+    title_hash = models.BigIntegerField(editable=False)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    hashtags = models.ManyToManyField(Hashtag, related_name="posts")
+    hashtags = models.ManyToManyField(
+        Hashtag, related_name="posts", through="PostHashtag"
+    )
     image = models.ImageField(
         blank=True, null=True, upload_to=post_image_file_path
     )
+    image_renditions = models.JSONField(default=dict, editable=False)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="posts"
     )
@@ -37,10 +92,58 @@ class Post(models.Model):
         related_name="liked_posts",
         blank=True,
     )
+    like_count = models.PositiveIntegerField(default=0)
+    # Bumped by likes, comments and hashtag changes too, so it validates
+    # the cached representation of the post.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "title_hash"],
+                name="post_user_title_hash_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"], name="post_created_at_id_idx"
+            ),
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="post_user_created_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.title_hash = title_hash(self.title)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "title" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "title_hash"}
+
+        super().save(*args, **kwargs)
+
+
+class PostHashtag(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = "social_media_post_hashtags"
+        unique_together = ("post", "hashtag")
+        indexes = [
+            models.Index(
+                fields=["hashtag", "post"], name="post_hashtag_tag_post_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.post_id}: {self.hashtag_id}"
+
 
 class Comment(models.Model):
     user = models.ForeignKey(
@@ -52,6 +155,56 @@ class Comment(models.Model):
         Post, related_name="comments", on_delete=models.CASCADE
     )
     content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ("-created_at", "-id")
+        indexes = [
+            models.Index(
+                fields=["post", "-created_at", "-id"],
+                name="comment_post_created_idx",
+            ),
+            models.Index(
+                fields=["user", "-created_at"],
+                name="comment_user_created_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.content
+
+
+class TimelineEntry(models.Model):
+    """A post fanned out to the home timeline of a follower of its author"""
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["owner", "post"], name="timeline_owner_post_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["owner", "-created_at", "-post"],
+                name="timeline_owner_created_idx",
+            ),
+            models.Index(
+                fields=["owner", "author"], name="timeline_owner_author_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.owner_id}: {self.post_id}"
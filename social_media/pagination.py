@@ -0,0 +1,204 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on the full ordering tuple.
+
+    DRF's CursorPagination only seeks on the first ordering field and falls
+    back to an offset for ties. Here the cursor stores the values of every
+    ordering field of the boundary row, so each page is a single range scan
+    over a matching composite index, however deep the client scrolls.
+
+    A queryset that is already explicitly ordered is paginated on that
+    ordering instead of the class default.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-id",)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+
+        return self._set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` fetching the page with the async ORM"""
+        queryset = self._page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+
+        return self._set_page([item async for item in queryset])
+
+    def _page_queryset(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse, position = self.cursor or (False, None)
+        ordering = self.ordering
+        if reverse:
+            ordering = [_reverse_field(field) for field in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            position = self._coerce_position(queryset, position)
+            queryset = queryset.filter(_seek(ordering, position))
+
+        return queryset[: self.page_size + 1]
+
+    def _set_page(self, results):
+        reverse, position = self.cursor or (False, None)
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.display_page_controls = self.has_next or self.has_previous
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        if queryset.query.order_by:
+            return tuple(queryset.query.order_by)
+
+        return super().get_ordering(request, queryset, view)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        return self._build_link(False, self._position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+
+        return self._build_link(True, self._position(self.page[0]))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            decoded = base64.urlsafe_b64decode(encoded.encode("ascii"))
+            payload = json.loads(decoded)
+            reverse = bool(payload["r"])
+            position = list(payload["p"])
+        except (
+            TypeError,
+            ValueError,
+            KeyError,
+            UnicodeError,
+            binascii.Error,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+        if len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return reverse, position
+
+    def _coerce_position(self, queryset, position):
+        """The cursor's values as their ordering fields' Python values"""
+        coerced = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            try:
+                value = _ordering_field(queryset, name).to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            coerced.append(value)
+
+        return coerced
+
+    def _position(self, item):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            value = item[name] if isinstance(item, dict) else getattr(
+                item, name
+            )
+            if hasattr(value, "isoformat"):
+                value = value.isoformat()
+            position.append(value)
+
+        return position
+
+    def _build_link(self, reverse, position):
+        payload = json.dumps({"r": int(reverse), "p": position})
+        encoded = base64.urlsafe_b64encode(payload.encode("utf-8"))
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode("ascii")
+        )
+
+
+class FollowCursorPagination(KeysetPagination):
+    """Most recent follows first, seeking on the follow edge id."""
+
+    ordering = ("-edge_id",)
+
+
+class PostCursorPagination(KeysetPagination):
+    """Newest posts first, seeking on the (created_at, id) index."""
+
+    ordering = ("-created_at", "-id")
+
+
+def _reverse_field(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
+
+
+def _ordering_field(queryset, name):
+    """The model field, or annotation output field, ordered on as `name`"""
+    annotation = queryset.query.annotations.get(name)
+    if annotation is not None:
+        return annotation.output_field
+
+    opts = queryset.model._meta
+    return opts.pk if name == "pk" else opts.get_field(name)
+
+
+def _seek(ordering, position):
+    """
+    Build the row-value comparison `(a, b) < (x, y)` as plain lookups:
+    `a < x OR (a = x AND b < y)`, honouring each field's direction.
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, position):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+
+    return condition
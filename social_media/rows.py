@@ -0,0 +1,112 @@
+"""
+Post list payloads built straight from `.values()` rows.
+
+They match what `PostListSerializer` renders, without instantiating a model
+and running every serializer field per post, which dominates the CPU time
+of the list endpoints once their queries are fixed. Only the columns the
+`?fields=` sparse fieldset asks for are selected.
+"""
+from rest_framework import serializers
+
+from Social_Media_API.metrics import timed_serialization
+from social_media.models import Post, PostHashtag
+from social_media.pagination import PostCursorPagination
+from social_media.serializers import PostListSerializer, image_renditions
+
+_datetime = serializers.DateTimeField()
+_image_storage = Post._meta.get_field("image").storage
+
+COLUMNS = {
+    "id": "id",
+    "title": "title",
+    "content": "content",
+    "created_at": "created_at",
+    "user": "user_id",
+    "image": "image",
+    "image_renditions": "image_renditions",
+    "like_count": "like_count",
+    "liked_by_me": "liked_by_me",
+}
+
+
+def _image_url(name, request):
+    if not name:
+        return None
+
+    url = _image_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def _fields(request) -> tuple:
+    fields = PostListSerializer.requested_fields(request)
+    if fields is None:
+        return PostListSerializer.Meta.fields
+
+    return tuple(
+        name for name in PostListSerializer.Meta.fields if name in fields
+    )
+
+
+def post_values(queryset, request):
+    """
+    `queryset` as `.values()` rows holding the requested fields and the
+    ones the keyset pagination seeks on, plus `updated_at` for ETags.
+    """
+    ordering = queryset.query.order_by or PostCursorPagination.ordering
+    columns = {"id", "updated_at"}
+    columns.update(field.lstrip("-") for field in ordering)
+    columns.update(
+        COLUMNS[name] for name in _fields(request) if name in COLUMNS
+    )
+
+    return queryset.prefetch_related(None).values(*columns)
+
+
+def post_list_payload(rows, request) -> list:
+    """Render `post_values` rows the way `PostListSerializer` does"""
+    fields = _fields(request)
+    hashtags = {}
+    if "hashtags" in fields:
+        hashtags = {row["id"]: [] for row in rows}
+        links = (
+            PostHashtag.objects.filter(post_id__in=hashtags)
+            .order_by("id")
+            .values_list("post_id", "hashtag__name")
+        )
+        for post_id, name in links:
+            hashtags[post_id].append(name)
+
+    formatters = {
+        "created_at": _datetime.to_representation,
+        "image": lambda name: _image_url(name, request),
+        "image_renditions": lambda value: image_renditions(value, request),
+    }
+    payload = []
+    for row in rows:
+        item = {}
+        for name in fields:
+            if name == "hashtags":
+                item[name] = hashtags[row["id"]]
+                continue
+
+            value = row[COLUMNS[name]]
+            formatter = formatters.get(name)
+            item[name] = formatter(value) if formatter else value
+        payload.append(item)
+
+    return payload
+
+
+class PostValuesListMixin:
+    """Serve post lists from `.values()` rows instead of model instances"""
+
+    def list(self, request, *args, **kwargs):
+        return self.values_page_response(
+            self.filter_queryset(self.get_queryset())
+        )
+
+    def values_page_response(self, queryset):
+        rows = self.paginate_queryset(post_values(queryset, self.request))
+        with timed_serialization():
+            payload = post_list_payload(rows, self.request)
+        return self.get_paginated_response(payload)
@@ -0,0 +1,173 @@
+"""
+Full-text search over `Post.title` and `Post.content`.
+
+SQLite keeps an external-content FTS5 table in sync with triggers and ranks
+with BM25. PostgreSQL keeps a generated, weighted `tsvector` column behind a
+GIN index and ranks with `ts_rank`. Other backends fall back to `icontains`.
+
+SQLite rebuilds a table to alter it, which drops its triggers, so any
+migration that alters `social_media_post` must call `install_search_index`
+again afterwards.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "social_media_post_fts"
+PG_INDEX = "social_media_post_search_idx"
+
+TERM_RE = re.compile(r"\w+")
+
+SQLITE_SCHEMA = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content,
+        content='social_media_post', content_rowid='id',
+        tokenize='unicode61', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+    AFTER INSERT ON social_media_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+    AFTER DELETE ON social_media_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF title, content ON social_media_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+)
+
+POSTGRESQL_SCHEMA = (
+    """
+    ALTER TABLE social_media_post
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS {PG_INDEX}
+    ON social_media_post USING GIN (search_vector)
+    """,
+)
+
+
+def install_search_index(connection) -> None:
+    """Create the search index and its sync triggers if missing"""
+    schema = {
+        "sqlite": SQLITE_SCHEMA,
+        "postgresql": POSTGRESQL_SCHEMA,
+    }.get(connection.vendor, ())
+
+    with connection.cursor() as cursor:
+        for statement in schema:
+            cursor.execute(statement)
+
+
+def uninstall_search_index(connection) -> None:
+    if connection.vendor == "sqlite":
+        statements = [
+            f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}"
+            for suffix in ("ai", "ad", "au")
+        ] + [f"DROP TABLE IF EXISTS {FTS_TABLE}"]
+    elif connection.vendor == "postgresql":
+        statements = [
+            f"DROP INDEX IF EXISTS {PG_INDEX}",
+            "ALTER TABLE social_media_post DROP COLUMN IF EXISTS search_vector",
+        ]
+    else:
+        statements = []
+
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def rebuild_search_index(connection) -> None:
+    """Repopulate the whole index from the posts table in one pass"""
+    install_search_index(connection)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute(f"REINDEX INDEX {PG_INDEX}")
+
+
+def search_posts(queryset, query: str):
+    """
+    Filter `queryset` down to posts matching every term of `query` as a
+    prefix and annotate each with a `rank`, higher meaning more relevant.
+    """
+    terms = TERM_RE.findall(query.lower())
+    if not terms:
+        return queryset.none().annotate(
+            rank=Value(0.0, output_field=FloatField())
+        )
+
+    vendor = connections[queryset.db].vendor
+
+    if vendor == "sqlite":
+        # Join the FTS table so the MATCH runs once for the whole query;
+        # a correlated subquery would rerun it, and bm25, for every row.
+        match = " ".join(f'"{term}"*' for term in terms)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f"{FTS_TABLE}.rowid = social_media_post.id",
+                f"{FTS_TABLE} MATCH %s",
+            ],
+            params=[match],
+        ).annotate(
+            rank=RawSQL(
+                f"-bm25({FTS_TABLE}, 10.0, 1.0)", [], output_field=FloatField()
+            )
+        )
+
+    if vendor == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        return queryset.filter(
+            RawSQL(
+                "social_media_post.search_vector "
+                "@@ to_tsquery('english', %s)",
+                [tsquery],
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            rank=RawSQL(
+                "ts_rank(social_media_post.search_vector, "
+                "to_tsquery('english', %s))",
+                [tsquery],
+                output_field=FloatField(),
+            )
+        )
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(content__icontains=term)
+
+    return queryset.filter(condition).annotate(
+        rank=Value(0.0, output_field=FloatField())
+    )
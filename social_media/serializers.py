@@ -1,6 +1,77 @@
+from functools import partial
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+from social_media.hashtags import (
+    HASHTAG_MAX_LENGTH,
+    extract_hashtags,
+    record_usage,
+    upsert_hashtags,
+)
+from social_media.models import Post, Comment, Hashtag, title_hash
+
+DUPLICATE_TITLE = "You already have a post with this title."
+
+
+def image_renditions(value, request=None):
+    """Original dimensions plus the URL and size of every rendition"""
+    if not value:
+        return None
+
+    representation = {"width": value["width"], "height": value["height"]}
+    for label, rendition in value["sizes"].items():
+        url = default_storage.url(rendition["name"])
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        representation[label] = {
+            "url": url,
+            "width": rendition["width"],
+            "height": rendition["height"],
+        }
+
+    return representation
+
+
+class ImageRenditionsField(serializers.ReadOnlyField):
+    def to_representation(self, value):
+        return image_renditions(value, self.context.get("request"))
+
+
+class SparseFieldsetMixin:
+    """
+    Let GET requests pick the fields they need with `?fields=id,title`,
+    so clients that do not show e.g. `content` do not pay for it.
+    """
 
-from social_media.models import Post, Comment, Hashtag
+    @classmethod
+    def requested_fields(cls, request):
+        """Fields listed in `?fields=`, None when all of them are wanted"""
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+
+        param = getattr(request, "query_params", request.GET).get("fields")
+        if not param:
+            return None
+
+        fields = {name.strip() for name in param.split(",") if name.strip()}
+        unknown = fields - set(cls.Meta.fields)
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": f"Unknown fields: {', '.join(sorted(unknown))}."}
+            )
+
+        return fields
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.requested_fields(self.context.get("request"))
+        if fields is not None:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
 
 
 class HashtagSerializer(serializers.ModelSerializer):
@@ -12,7 +83,7 @@ class HashtagSerializer(serializers.ModelSerializer):
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
-        fields = ("user", "content")
+        fields = ("id", "user", "content", "created_at")
 
 
 class CommentListSerializer(serializers.ModelSerializer):
@@ -22,6 +93,11 @@ class CommentListSerializer(serializers.ModelSerializer):
 
 
 class PostSerializer(serializers.ModelSerializer):
+    # Declared: DRF makes relations with a through model read-only.
+    hashtags = serializers.PrimaryKeyRelatedField(
+        queryset=Hashtag.objects.all(), many=True, required=False
+    )
+
     class Meta:
         model = Post
         fields = (
@@ -33,11 +109,87 @@ class PostSerializer(serializers.ModelSerializer):
             "image",
         )
 
+    def create(self, validated_data):
+        """Create a post tagged with its explicit and #content hashtags"""
+        hashtags = self._content_hashtags(
+            validated_data.get("hashtags", []), validated_data["content"]
+        )
+        validated_data["hashtags"] = hashtags
+        post = self._save_unique_title(
+            partial(super().create, validated_data),
+            validated_data["user"].id,
+            validated_data["title"],
+        )
+        if hashtags:
+            record_usage.delay(
+                [hashtag.id for hashtag in hashtags], timezone.now()
+            )
+
+        return post
+
+    def update(self, instance, validated_data):
+        """Update a post, adding the hashtags found in its new content"""
+        added = []
+        if "content" in validated_data or "hashtags" in validated_data:
+            previous = set(instance.hashtags.values_list("id", flat=True))
+            hashtags = self._content_hashtags(
+                validated_data.get("hashtags", instance.hashtags.all()),
+                validated_data.get("content", instance.content),
+            )
+            validated_data["hashtags"] = hashtags
+            added = [
+                hashtag.id
+                for hashtag in hashtags
+                if hashtag.id not in previous
+            ]
+
+        post = self._save_unique_title(
+            partial(super().update, instance, validated_data),
+            instance.user_id,
+            validated_data.get("title", instance.title),
+            instance.pk,
+        )
+        if added:
+            record_usage.delay(added, timezone.now())
+
+        return post
+
+    @staticmethod
+    def _save_unique_title(save, user_id, title, pk=None):
+        """
+        Run `save`, letting the database check that the title is unique
+        among the user's posts: only a failed write costs another query.
+        """
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            duplicate = (
+                Post.objects.filter(
+                    user_id=user_id, title_hash=title_hash(title)
+                )
+                .exclude(pk=pk)
+                .exists()
+            )
+            if duplicate:
+                raise serializers.ValidationError({"title": [DUPLICATE_TITLE]})
+            raise
+
+    @staticmethod
+    def _content_hashtags(hashtags, content):
+        explicit = {hashtag.id: hashtag for hashtag in hashtags}
+        for hashtag in upsert_hashtags(extract_hashtags(content)):
+            explicit.setdefault(hashtag.id, hashtag)
+
+        return list(explicit.values())
+
 
-class PostListSerializer(serializers.ModelSerializer):
+class PostListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     hashtags = serializers.SlugRelatedField(
         slug_field="name", read_only=True, many=True
     )
+    liked_by_me = serializers.BooleanField(read_only=True)
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Post
@@ -49,13 +201,20 @@ class PostListSerializer(serializers.ModelSerializer):
             "user",
             "hashtags",
             "image",
-            "liked_by",
+            "image_renditions",
+            "like_count",
+            "liked_by_me",
         )
 
 
-class PostDetailSerializer(serializers.ModelSerializer):
-    comments = CommentSerializer(many=True, read_only=True)
-    liked_by = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+class PostDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    comments = CommentSerializer(
+        source="latest_comments", many=True, read_only=True
+    )
+    # Per user, so left out of the shared payload cache and filled in by
+    # the view on every request, see `liked_by_me`.
+    liked_by_me = serializers.BooleanField(read_only=True)
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Post
@@ -67,6 +226,52 @@ class PostDetailSerializer(serializers.ModelSerializer):
             "user",
             "hashtags",
             "image",
-            "liked_by",
+            "image_renditions",
+            "like_count",
+            "liked_by_me",
             "comments",
         )
+
+
+class BulkLikeSerializer(serializers.Serializer):
+    posts = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=500
+    )
+    liked = serializers.BooleanField(default=True)
+
+
+class PostImportSerializer(serializers.Serializer):
+    """One row of a bulk post import"""
+
+    # An id or an email, resolved per chunk. Ignored by the batch API,
+    # which creates the posts of the current user.
+    user = serializers.CharField(required=False)
+    title = serializers.CharField(
+        max_length=Post._meta.get_field("title").max_length
+    )
+    content = serializers.CharField()
+    hashtags = serializers.ListField(
+        child=serializers.CharField(), required=False, default=list
+    )
+
+    def validate_hashtags(self, value):
+        """Lowercased names, with or without a leading #"""
+        names = [name.lstrip("#").lower() for name in value]
+        if any(len(name) > HASHTAG_MAX_LENGTH for name in names):
+            raise serializers.ValidationError(
+                f"Hashtags are at most {HASHTAG_MAX_LENGTH} characters long."
+            )
+
+        return names
+
+
+class BulkPostCreateSerializer(serializers.Serializer):
+    posts = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=500
+    )
+
+
+class TrendingHashtagSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source="hashtag_id")
+    name = serializers.CharField(source="hashtag__name")
+    uses = serializers.IntegerField()
@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from social_media.cache import invalidate, post_namespace
+from social_media.images import schedule_renditions
+from social_media.likes import Like, recount_likes
+from social_media.models import Comment, Hashtag, Post
+
+
+def invalidate_posts(post_ids) -> None:
+    invalidate(*(post_namespace(post_id) for post_id in post_ids))
+
+
+def touch_posts(post_ids) -> None:
+    """Invalidate posts whose embedded data changed and bump `updated_at`"""
+    Post.objects.filter(id__in=post_ids).touch()
+    invalidate_posts(post_ids)
+
+
+@receiver(m2m_changed, sender=Like)
+def sync_like_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep `like_count` right when likes change through the M2M manager"""
+    if action == "pre_clear" and reverse:
+        instance._cleared_post_ids = list(
+            instance.liked_posts.values_list("id", flat=True)
+        )
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        post_ids = [instance.pk]
+    elif action == "post_clear":
+        post_ids = instance.__dict__.pop("_cleared_post_ids", [])
+    else:
+        post_ids = pk_set
+
+    recount_likes(post_ids)
+    invalidate_posts(post_ids)
+
+
+@receiver(m2m_changed, sender=Post.hashtags.through)
+def invalidate_post_hashtags(sender, instance, action, reverse, **kwargs):
+    if action == "pre_clear" and reverse:
+        instance._cleared_post_ids = list(
+            instance.posts.values_list("id", flat=True)
+        )
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        touch_posts([instance.pk])
+    elif action == "post_clear":
+        touch_posts(instance.__dict__.pop("_cleared_post_ids", []))
+    else:
+        touch_posts(kwargs["pk_set"])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    invalidate_posts([instance.pk])
+
+
+@receiver(post_save, sender=Post)
+def build_post_image_renditions(sender, instance, **kwargs):
+    schedule_renditions(instance, "image", "image_renditions")
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_post(sender, instance, **kwargs):
+    touch_posts([instance.post_id])
+
+
+@receiver(pre_delete, sender=Hashtag)
+def remember_hashtag_posts(sender, instance, **kwargs):
+    instance._post_ids = list(instance.posts.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Hashtag)
+@receiver(post_delete, sender=Hashtag)
+def invalidate_hashtags(sender, instance, created=False, **kwargs):
+    invalidate("hashtags")
+    if "_post_ids" in instance.__dict__:
+        post_ids = instance.__dict__.pop("_post_ids")
+    elif created:
+        post_ids = []
+    else:
+        # Renamed: the posts embed hashtag names.
+        post_ids = list(instance.posts.values_list("id", flat=True))
+    touch_posts(post_ids)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def remember_liked_posts(sender, instance, **kwargs):
+    instance._liked_post_ids = list(
+        instance.liked_posts.values_list("id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def recount_liked_posts(sender, instance, **kwargs):
+    post_ids = instance.__dict__.pop("_liked_post_ids", [])
+    recount_likes(post_ids)
+    invalidate_posts(post_ids)
@@ -1,3 +1,1218 @@
+import base64
+import json
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from Social_Media_API.db_routing import ReplicaRouter
+from Social_Media_API.metrics import HISTOGRAMS, record_query
+from Social_Media_API.renderers import FastJSONRenderer
+from social_media.cache import get_or_compute
+from social_media.hashtags import (
+    HASHTAG_MAX_LENGTH,
+    extract_hashtags,
+    record_usage,
+    upsert_hashtags,
+    usage_bucket,
+)
+from social_media.likes import Like, recount_likes, unlike_posts
+from social_media.models import (
+    Comment,
+    Hashtag,
+    HashtagUsage,
+    Post,
+    TimelineEntry,
+    title_hash,
+)
+from social_media.rows import post_list_payload, post_values
+from social_media.serializers import PostListSerializer
+from social_media.timeline import fan_out_post, timeline_posts
+from tasks.worker import run_pending
+from user.graph import follow_users, unfollow_users
+
+
+class QueryBudgetMixin:
+    """Fail a test when an endpoint issues more queries than its budget"""
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+
+        executed = len(context.captured_queries)
+        self.assertLessEqual(
+            executed,
+            budget,
+            f"{executed} queries executed, budget is {budget}:\n"
+            + "\n".join(query["sql"] for query in context.captured_queries),
+        )
+
+
+def sample_social_graph(users=3, posts_per_user=5, comments_per_post=3):
+    """Users following each other, with tagged, liked and commented posts"""
+    users = [
+        get_user_model().objects.create_user(f"user{i}@test.com", "pass12345")
+        for i in range(users)
+    ]
+    hashtags = [Hashtag.objects.create(name=f"tag{i}") for i in range(3)]
+
+    for user in users:
+        user.following.set(other for other in users if other != user)
+        for i in range(posts_per_user):
+            post = Post.objects.create(
+                title=f"{user.email} {i}", content="content", user=user
+            )
+            post.hashtags.set(hashtags)
+            post.liked_by.set(users)
+            fan_out_post(post.id)
+            for j in range(comments_per_post):
+                Comment.objects.create(
+                    post=post, user=users[j % len(users)], content="comment"
+                )
+
+    return users
+
+
+class PostQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = sample_social_graph()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+        self.post = Post.objects.first()
+
+    def test_post_list(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse("social_media:post-list"))
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_retrieve(self):
+        url = reverse("social_media:post-detail", args=[self.post.id])
+        with self.assertMaxQueries(4):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["comments"]), 3)
+
+    def test_post_comments(self):
+        url = reverse("social_media:post-comments", args=[self.post.id])
+        with self.assertMaxQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_hashtag_list(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse("social_media:hashtag-list"))
+
+        self.assertEqual(response.status_code, 200)
+
+
+class LikeCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.other = (
+            get_user_model().objects.create_user(email, "pass12345")
+            for email in ("user@test.com", "other@test.com")
+        )
+        self.posts = [
+            Post.objects.create(title=f"post {i}", content="c", user=self.user)
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def like_counts(self):
+        return list(
+            Post.objects.order_by("id").values_list("like_count", flat=True)
+        )
+
+    def test_like_and_unlike(self):
+        post = self.posts[0]
+        like = reverse("social_media:post-like", args=[post.id])
+        unlike = reverse("social_media:post-unlike", args=[post.id])
+
+        self.client.get(like)
+        self.client.get(like)
+        self.assertEqual(self.like_counts(), [1, 0, 0])
+
+        self.client.get(unlike)
+        self.client.get(unlike)
+        self.assertEqual(self.like_counts(), [0, 0, 0])
+
+    def test_detail_reports_liked_by_me_per_user(self):
+        cache.clear()
+        post = self.posts[0]
+        post.liked_by.add(self.other)
+        url = reverse("social_media:post-detail", args=[post.id])
+
+        response = self.client.get(url)
+        self.assertNotIn("liked_by", response.data)
+        self.assertEqual(response.data["like_count"], 1)
+        self.assertFalse(response.data["liked_by_me"])
+
+        # Served from the payload cache filled for `self.user` above.
+        self.client.force_authenticate(self.other)
+        self.assertTrue(self.client.get(url).data["liked_by_me"])
+        response = self.client.get(url, {"fields": "id,like_count"})
+        self.assertEqual(set(response.data), {"id", "like_count"})
+
+    def test_bulk_like(self):
+        url = reverse("social_media:post-bulk-like")
+        ids = [post.id for post in self.posts]
+        self.posts[0].liked_by.add(self.user)
+
+        response = self.client.post(url, {"posts": ids}, format="json")
+        self.assertEqual(response.data["posts"], ids[1:])
+        self.assertEqual(self.like_counts(), [1, 1, 1])
+
+        response = self.client.post(
+            url, {"posts": ids[:2], "liked": False}, format="json"
+        )
+        self.assertEqual(sorted(response.data["posts"]), ids[:2])
+        self.assertEqual(self.like_counts(), [0, 0, 1])
+
+    def test_m2m_clear(self):
+        for post in self.posts:
+            post.liked_by.add(self.user, self.other)
+        self.assertEqual(self.like_counts(), [2, 2, 2])
+
+        self.posts[0].liked_by.clear()
+        self.assertEqual(self.like_counts(), [0, 2, 2])
+
+        self.other.liked_posts.clear()
+        self.assertEqual(self.like_counts(), [0, 1, 1])
+
+    def test_recount_repairs_drift(self):
+        self.posts[0].liked_by.add(self.user)
+        Post.objects.update(like_count=7)
+
+        recount_likes([post.id for post in self.posts])
+
+        self.assertEqual(self.like_counts(), [1, 0, 0])
+
+
+class PayloadCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "author@test.com", "pass12345"
+        )
+        self.post = Post.objects.create(
+            title="post", content="content", user=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("social_media:post-detail", args=[self.post.id])
+
+    def test_writes_invalidate_the_post_detail(self):
+        self.client.get(self.url)
+        # Only the per user `liked_by_me` is looked up on a hit.
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+        self.client.patch(self.url, {"title": "renamed"})
+        self.assertEqual(self.client.get(self.url).data["title"], "renamed")
+
+        Comment.objects.create(post=self.post, user=self.user, content="c")
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data["comments"]), 1)
+
+        self.client.delete(self.url)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def start_blocked_compute(self, payload):
+        """Compute `payload` in a thread, holding the lock until released"""
+        started, release, results = threading.Event(), threading.Event(), []
+
+        def compute():
+            started.set()
+            release.wait(5)
+            return payload
+
+        thread = threading.Thread(
+            target=lambda: results.append(
+                get_or_compute("test", "key", compute, timeout=0.05)
+            )
+        )
+        thread.start()
+        started.wait(5)
+        return thread, release, results
+
+    def test_cold_miss_waits_for_the_first_caller(self):
+        thread, release, results = self.start_blocked_compute("first")
+        waiter = threading.Thread(
+            target=lambda: results.append(
+                get_or_compute("test", "key", lambda: "second")
+            )
+        )
+        waiter.start()
+        # Long enough for the waiter to find the lock taken.
+        time.sleep(0.2)
+        release.set()
+        thread.join()
+        waiter.join()
+
+        self.assertEqual(results, ["first", "first"])
+
+    def test_stale_entry_is_served_while_one_caller_recomputes(self):
+        get_or_compute("test", "key", lambda: "old", timeout=0.05)
+        time.sleep(0.1)
+
+        thread, release, results = self.start_blocked_compute("new")
+        stale = get_or_compute("test", "key", lambda: "unexpected")
+        release.set()
+        thread.join()
+
+        self.assertEqual(stale, "old")
+        self.assertEqual(results, ["new"])
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.reader, self.author, self.other = (
+            get_user_model().objects.create_user(email, "pass12345")
+            for email in ("reader@test.com", "author@test.com", "o@test.com")
+        )
+        follow_users(self.reader, [self.author.id])
+        run_pending()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def publish(self, title):
+        response = self.client.post(
+            reverse("social_media:post-list"), {"title": title, "content": "c"}
+        )
+        run_pending()
+        return response.data["id"]
+
+    def timeline(self, owner):
+        return list(timeline_posts(owner).values_list("id", flat=True))
+
+    def test_posts_reach_followers_until_they_unfollow(self):
+        first = self.publish("first")
+        self.assertEqual(self.timeline(self.reader), [first])
+        self.assertEqual(self.timeline(self.other), [])
+
+        unfollow_users(self.reader, [self.author.id])
+        run_pending()
+        self.publish("second")
+        self.assertEqual(self.timeline(self.reader), [])
+
+    def test_authors_over_the_fan_out_limit_are_merged_on_read(self):
+        with self.settings(TIMELINE_FANOUT_LIMIT=0):
+            post_id = self.publish("popular")
+            self.assertFalse(TimelineEntry.objects.exists())
+            self.assertEqual(self.timeline(self.reader), [post_id])
+
+    def test_rebuild_matches_the_pull_query(self):
+        follow_users(self.other, [self.author.id, self.reader.id])
+        run_pending()
+        for user in (self.author, self.reader, self.other):
+            for i in range(3):
+                Post.objects.create(title=f"{i}", content="c", user=user)
+        TimelineEntry.objects.all().delete()
+
+        call_command("rebuild_timelines", stdout=StringIO())
+
+        for owner in (self.reader, self.other, self.author):
+            self.assertEqual(
+                self.timeline(owner),
+                list(
+                    Post.objects.filter(user__in=owner.following.all())
+                    .order_by("-created_at", "-id")
+                    .values_list("id", flat=True)
+                ),
+            )
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "author@test.com", "pass12345"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        now = timezone.now()
+        posts = [
+            Post.objects.create(title=f"post {i}", content="c", user=self.user)
+            for i in range(7)
+        ]
+        # Three pairs of posts created at the same moment.
+        for i, post in enumerate(posts):
+            Post.objects.filter(id=post.id).update(
+                created_at=now - timedelta(minutes=i // 2)
+            )
+        self.expected = list(
+            Post.objects.order_by("-created_at", "-id").values_list(
+                "id", flat=True
+            )
+        )
+        self.url = reverse("social_media:post-list") + "?page_size=2"
+
+    def test_pages_forward_and_back_through_ties(self):
+        url, pages = self.url, []
+        while url:
+            response = self.client.get(url)
+            pages.append([post["id"] for post in response.data["results"]])
+            url = response.data["next"]
+
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual(len(pages), 4)
+
+        url, back = response.data["previous"], []
+        while url:
+            response = self.client.get(url)
+            back.insert(0, [post["id"] for post in response.data["results"]])
+            url = response.data["previous"]
+
+        self.assertEqual(back, pages[:-1])
+
+    def test_tampered_cursors_are_not_found(self):
+        positions = [
+            ["notadate", 1],
+            [{"a": 1}, 1],
+            [None, 1],
+            [timezone.now().isoformat(), "x"],
+            [timezone.now().isoformat()],
+        ]
+        for position in positions:
+            cursor = base64.urlsafe_b64encode(
+                json.dumps({"r": 0, "p": position}).encode()
+            ).decode()
+            response = self.client.get(f"{self.url}&cursor={cursor}")
+            self.assertEqual(response.status_code, 404, position)
+
+        response = self.client.get(f"{self.url}&cursor=notbase64")
+        self.assertEqual(response.status_code, 404)
+
+
+class PostDetailCommentsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "author@test.com", "pass12345"
+        )
+        self.post = Post.objects.create(
+            title="post", content="content", user=self.user
+        )
+        self.comments = [
+            Comment.objects.create(
+                post=self.post, user=self.user, content=f"comment {i}"
+            )
+            for i in range(15)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_detail_embeds_latest_comments_only(self):
+        url = reverse("social_media:post-detail", args=[self.post.id])
+        with self.settings(POST_DETAIL_COMMENT_LIMIT=5):
+            response = self.client.get(url)
+
+        self.assertEqual(
+            [comment["id"] for comment in response.data["comments"]],
+            [comment.id for comment in self.comments[:-6:-1]],
+        )
+
+    def test_comments_are_paginated_newest_first(self):
+        url = reverse("social_media:post-comments", args=[self.post.id])
+        url += "?page_size=4"
+        seen = []
+        while url:
+            response = self.client.get(url)
+            seen += [comment["id"] for comment in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(seen, [comment.id for comment in self.comments[::-1]])
+
+
+class HashtagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "user@test.com", "pass12345"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_extract_and_upsert(self):
+        too_long = "x" * (HASHTAG_MAX_LENGTH + 1)
+        names = extract_hashtags(f"#Django and #API, #django #{too_long} #a")
+        self.assertEqual(names, ["django", "api", "a"])
+
+        Hashtag.objects.create(name="api")
+        hashtags = upsert_hashtags(names)
+        self.assertEqual(
+            sorted(hashtag.name for hashtag in hashtags),
+            ["a", "api", "django"],
+        )
+        self.assertEqual(Hashtag.objects.count(), 3)
+
+    def test_usage_is_counted_per_hour(self):
+        django, api = (
+            Hashtag.objects.create(name=name) for name in ("django", "api")
+        )
+        now = timezone.now()
+        record_usage([django.id, django.id, api.id], now)
+        record_usage([django.id], now.isoformat())
+        record_usage([django.id], now - timedelta(hours=1))
+
+        self.assertEqual(
+            list(
+                HashtagUsage.objects.order_by("bucket", "hashtag__name")
+                .values_list("hashtag__name", "bucket", "count")
+            ),
+            [
+                ("django", usage_bucket(now - timedelta(hours=1)), 1),
+                ("api", usage_bucket(now), 1),
+                ("django", usage_bucket(now), 3),
+            ],
+        )
+
+    def trending(self, query=""):
+        response = self.client.get(
+            reverse("social_media:hashtag-trending") + query
+        )
+        return [(tag["name"], tag["uses"]) for tag in response.data]
+
+    def test_trending_window_and_limit(self):
+        a, b, c = (Hashtag.objects.create(name=name) for name in "abc")
+        now = timezone.now()
+        for hashtag, hours_ago, count in (
+            (a, 0, 3),
+            (b, 0, 1),
+            (b, 1, 5),
+            (c, 30, 100),
+        ):
+            moment = now - timedelta(hours=hours_ago)
+            record_usage([hashtag.id] * count, moment)
+
+        self.assertEqual(self.trending("?hours=1"), [("a", 3), ("b", 1)])
+        self.assertEqual(self.trending("?hours=0"), [("a", 3), ("b", 1)])
+        self.assertEqual(self.trending(), [("b", 6), ("a", 3)])
+        self.assertEqual(self.trending("?hours=48&limit=1"), [("c", 100)])
+        self.assertEqual(self.trending("?limit=0"), [("b", 6)])
+        self.assertEqual(self.trending("?limit=x"), [("b", 6), ("a", 3)])
+
+
+class ImageRenditionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = self.settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = get_user_model().objects.create_user(
+            "author@test.com", "pass12345"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @staticmethod
+    def jpeg_with_exif():
+        """600x300 pixels, to be shown rotated by a quarter turn"""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 CW.
+        exif[0x010F] = "Camera maker"
+        buffer = BytesIO()
+        Image.new("RGB", (600, 300), "red").save(buffer, "JPEG", exif=exif)
+        return SimpleUploadedFile(
+            "photo.jpg", buffer.getvalue(), content_type="image/jpeg"
+        )
+
+    def test_renditions_are_resized_without_exif(self):
+        response = self.client.post(
+            reverse("social_media:post-list"),
+            {"title": "t", "content": "c", "image": self.jpeg_with_exif()},
+        )
+        post = Post.objects.get(id=response.data["id"])
+        self.assertEqual(post.image_renditions, {})
+
+        run_pending()
+        post.refresh_from_db()
+        renditions = post.image_renditions
+        self.assertEqual(renditions["source"], post.image.name)
+        self.assertEqual(
+            (renditions["width"], renditions["height"]), (300, 600)
+        )
+        self.assertEqual(
+            {
+                label: (size["width"], size["height"])
+                for label, size in renditions["sizes"].items()
+            },
+            {
+                "thumbnail": (75, 150),
+                "small": (240, 480),
+                "medium": (300, 600),
+            },
+        )
+        with default_storage.open(post.image.name) as file:
+            self.assertTrue(Image.open(file).getexif())
+        for size in renditions["sizes"].values():
+            with default_storage.open(size["name"]) as file:
+                image = Image.open(file)
+                self.assertEqual(image.format, "WEBP")
+                self.assertEqual(image.size, (size["width"], size["height"]))
+                self.assertFalse(image.getexif())
+
+        response = self.client.get(
+            reverse("social_media:post-detail", args=[post.id])
+        )
+        thumbnail = response.data["image_renditions"]["thumbnail"]
+        self.assertEqual(
+            thumbnail["url"],
+            "http://testserver"
+            + default_storage.url(renditions["sizes"]["thumbnail"]["name"]),
+        )
+        self.assertEqual((thumbnail["width"], thumbnail["height"]), (75, 150))
+
+
+class PostSearchTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "author@test.com", "pass12345"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        response = self.client.get(
+            reverse("social_media:post-search"), {"q": query}
+        )
+        return [post["title"] for post in response.data["results"]]
+
+    def test_prefix_terms_ranked_by_relevance(self):
+        Post.objects.create(
+            title="cooking", content="django mentioned once", user=self.user
+        )
+        Post.objects.create(
+            title="django tips", content="django djangonaut", user=self.user
+        )
+        Post.objects.create(title="other", content="nothing", user=self.user)
+
+        self.assertEqual(self.search("djang"), ["django tips", "cooking"])
+        self.assertEqual(self.search("djang tips"), ["django tips"])
+
+    def test_index_follows_updates_and_deletes(self):
+        post = Post.objects.create(
+            title="first", content="content", user=self.user
+        )
+        post.title = "renamed"
+        post.save()
+        self.assertEqual(self.search("first"), [])
+        self.assertEqual(self.search("renamed"), ["renamed"])
+
+        post.delete()
+        self.assertEqual(self.search("renamed"), [])
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = sample_social_graph()
+        token = AccessToken.for_user(self.users[0])
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    def test_async_views_match_sync_views(self):
+        post = Post.objects.first()
+        for sync_name, async_name, args in (
+            ("user:me-posts", "user:me-posts-async", ()),
+            ("user:liked-posts", "user:liked-posts-async", ()),
+            ("user:following-posts", "user:following-posts-async", ()),
+            (
+                "social_media:post-detail",
+                "social_media:post-detail-async",
+                (post.id,),
+            ),
+        ):
+            with self.subTest(async_name):
+                cache.clear()
+                expected = self.client.get(
+                    reverse(sync_name, args=args), headers=self.headers
+                ).json()
+                cache.clear()
+                response = self.client.get(
+                    reverse(async_name, args=args), headers=self.headers
+                )
+
+                self.assertEqual(response.status_code, 200)
+                payload = response.json()
+                if "results" in expected:
+                    expected, payload = expected["results"], payload["results"]
+                self.assertEqual(payload, expected)
+
+    def test_async_views_answer_conditional_gets(self):
+        post = Post.objects.first()
+        for url in (
+            reverse("user:me-posts-async"),
+            reverse("user:following-posts-async"),
+            reverse("social_media:post-detail-async", args=[post.id]),
+        ):
+            with self.subTest(url):
+                response = self.client.get(url, headers=self.headers)
+                self.assertIn("no-cache", response["Cache-Control"])
+                headers = {**self.headers, "If-None-Match": response["ETag"]}
+                response = self.client.get(url, headers=headers)
+                self.assertEqual(response.status_code, 304)
+
+        # The detail comes last, and embeds its latest comments.
+        Comment.objects.create(post=post, user=self.users[1], content="new")
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response)
+
+    def test_async_views_require_authentication(self):
+        response = self.client.get(reverse("user:me-posts-async"))
+        self.assertEqual(response.status_code, 401)
+
+
+class ConditionalGetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = sample_social_graph()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+        self.post = Post.objects.first()
+
+    def assertNotModified(self, url, budget, headers):
+        with self.assertMaxQueries(budget):
+            response = self.client.get(url, headers=headers)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+
+    def test_post_detail(self):
+        url = reverse("social_media:post-detail", args=[self.post.id])
+        etag = self.client.get(url)["ETag"]
+        self.assertNotModified(url, 1, {"If-None-Match": etag})
+
+        last_modified = self.client.get(url)["Last-Modified"]
+        self.assertNotModified(url, 1, {"If-Modified-Since": last_modified})
+
+        Comment.objects.create(
+            post=self.post, user=self.users[1], content="new"
+        )
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_timeline(self):
+        url = reverse("user:following-posts")
+        etag = self.client.get(url)["ETag"]
+        self.assertNotModified(url, 2, {"If-None-Match": etag})
+
+        newest = self.client.get(url).data["results"][0]["id"]
+        unlike_posts(self.users[1], [newest])
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_post_list_after_hashtag_rename(self):
+        url = reverse("social_media:post-list")
+        etag = self.client.get(url)["ETag"]
+
+        hashtag = Hashtag.objects.first()
+        hashtag.name = "renamed"
+        hashtag.save()
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("renamed", response.data["results"][0]["hashtags"])
+
+    def test_hashtag_list(self):
+        url = reverse("social_media:hashtag-list")
+        etag = self.client.get(url)["ETag"]
+        self.assertNotModified(url, 0, {"If-None-Match": etag})
+
+        Hashtag.objects.first().delete()
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = sample_social_graph()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+        self.post = Post.objects.first()
+
+    def test_list_and_detail_return_only_requested_fields(self):
+        for url in (
+            reverse("social_media:post-list"),
+            reverse("user:me-posts"),
+            reverse("user:following-posts"),
+        ):
+            with self.subTest(url):
+                response = self.client.get(url, {"fields": "id,hashtags"})
+                self.assertEqual(
+                    set(response.data["results"][0]), {"id", "hashtags"}
+                )
+
+        url = reverse("social_media:post-detail", args=[self.post.id])
+        full = self.client.get(url).data
+        sparse = self.client.get(url, {"fields": "title,like_count"}).data
+        self.assertEqual(
+            sparse, {"title": full["title"], "like_count": full["like_count"]}
+        )
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(
+            reverse("social_media:post-list"), {"fields": "id,password"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_values_rows_match_serializer(self):
+        request = APIRequestFactory().get("/")
+        posts = Post.objects.with_liked_by_me(self.users[0]).order_by("-id")
+        expected = PostListSerializer(
+            posts.prefetch_related("hashtags"),
+            many=True,
+            context={"request": Request(request)},
+        ).data
+
+        rows = post_values(posts, Request(request))
+        self.assertEqual(post_list_payload(rows, Request(request)), expected)
+
+    def test_fast_renderer_matches_json_renderer(self):
+        data = {
+            1: [{"title": "caf\u00e9 \u2028", "at": timezone.now()}],
+            "nothing": None,
+        }
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+
+class GenerateSocialGraphTests(TestCase):
+    def test_counters_match_generated_rows(self):
+        call_command(
+            "generate_social_graph",
+            users=30,
+            avg_following=5,
+            posts=60,
+            likes=300,
+            comments=40,
+            hashtags=10,
+            seed=1,
+            stdout=StringIO(),
+        )
+
+        for user in get_user_model().objects.all():
+            self.assertEqual(user.follower_count, user.followers.count())
+            self.assertEqual(user.following_count, user.following.count())
+        for post in Post.objects.all():
+            self.assertEqual(post.like_count, post.liked_by.count())
+        self.assertEqual(Comment.objects.count(), 40)
+
+    def test_backdates_without_touching_auto_now_add(self):
+        output = StringIO()
+        started = timezone.now()
+        call_command(
+            "generate_social_graph",
+            users=10,
+            posts=20,
+            likes=200,
+            comments=10,
+            hashtags=0,
+            seed=1,
+            stdout=output,
+        )
+
+        self.assertTrue(Post._meta.get_field("created_at").auto_now_add)
+        self.assertTrue(Post.objects.filter(created_at__lt=started).exists())
+        for comment in Comment.objects.select_related("post"):
+            self.assertGreaterEqual(
+                comment.created_at, comment.post.created_at
+            )
+        # Duplicate likes are dropped, and not reported as inserted.
+        likes = f"  Post_liked_by: {Like.objects.count()}\n"
+        self.assertIn(likes, output.getvalue())
+
+
+class BenchmarkRoutesTests(TestCase):
+    def test_writes_are_measured_and_rolled_back(self):
+        sample_social_graph()
+        counts = (Post.objects.count(), Like.objects.count())
+        output = StringIO()
+        # The test runner already set the test environment up.
+        with mock.patch(
+            "social_media.management.commands.benchmark_routes"
+            ".setup_test_environment"
+        ):
+            call_command(
+                "benchmark_routes",
+                iterations=2,
+                warmup=0,
+                stdout=output,
+                stderr=StringIO(),
+            )
+
+        routes = json.loads(output.getvalue())["routes"]
+        self.assertEqual(
+            routes["social-media:post-list"]["POST"]["status"], 201
+        )
+        self.assertEqual(
+            routes["social-media:post-detail"]["DELETE"]["status"], 204
+        )
+        # Liking through GET counts as a write, not as a read.
+        self.assertGreater(
+            routes["social-media:post-unlike"]["GET"]["queries"], 0
+        )
+        self.assertEqual((Post.objects.count(), Like.objects.count()), counts)
+
+
+class PostTitleUniquenessTests(TestCase):
+    def setUp(self):
+        self.user, self.other = (
+            get_user_model().objects.create_user(email, "pass12345")
+            for email in ("user@test.com", "other@test.com")
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("social_media:post-list")
+
+    def test_titles_are_unique_per_user(self):
+        Post.objects.create(title="same", content="c", user=self.other)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                self.url, {"title": "same", "content": "c"}
+            )
+        self.assertEqual(response.status_code, 201)
+        # The database enforces uniqueness, no lookup precedes the insert.
+        self.assertFalse(
+            [
+                query
+                for query in context.captured_queries
+                if query["sql"].startswith("SELECT")
+                and "title_hash" in query["sql"]
+            ]
+        )
+
+        response = self.client.post(
+            self.url, {"title": "same", "content": "c"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("title", response.data)
+
+    def test_rename_to_an_existing_title(self):
+        Post.objects.create(title="first", content="c", user=self.user)
+        second = Post.objects.create(
+            title="second", content="c", user=self.user
+        )
+        url = reverse("social_media:post-detail", args=[second.id])
+
+        response = self.client.patch(url, {"title": "first"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.patch(url, {"title": "renamed"})
+        self.assertEqual(response.status_code, 200)
+        second.refresh_from_db()
+        self.assertEqual(second.title_hash, title_hash("renamed"))
+
+
+class PostHashtagWriteTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@test.com", "pass12345"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.django, self.api = (
+            Hashtag.objects.create(name=name) for name in ("django", "api")
+        )
+
+    def hashtags(self, post_id):
+        return set(
+            Post.objects.get(id=post_id).hashtags.values_list(
+                "name", flat=True
+            )
+        )
+
+    def test_create_with_explicit_hashtag_ids(self):
+        response = self.client.post(
+            reverse("social_media:post-list"),
+            {"title": "t", "content": "#web", "hashtags": [self.django.id]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.hashtags(response.data["id"]), {"django", "web"})
+
+    def test_update_replaces_and_clears_hashtags(self):
+        post = Post.objects.create(title="t", content="c", user=self.user)
+        post.hashtags.set([self.django])
+        url = reverse("social_media:post-detail", args=[post.id])
+
+        response = self.client.put(
+            url,
+            {"title": "t", "content": "c", "hashtags": [self.api.id]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.hashtags(post.id), {"api"})
+
+        response = self.client.patch(url, {"hashtags": []}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.hashtags(post.id), set())
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "author@test.com", "pass12345"
+        )
+        self.follower = get_user_model().objects.create_user(
+            "follower@test.com", "pass12345"
+        )
+        self.follower.following.add(self.user)
+        Post.objects.create(title="taken", content="c", user=self.user)
+
+    def test_command_imports_valid_rows_and_reports_the_others(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as file:
+            file.write(
+                "user,title,content,hashtags\n"
+                f"{self.user.id},first,about #Django,#api web\n"
+                "follower@test.com,second,no tags,\n"
+                "nobody@test.com,third,c,\n"
+                "author@test.com,taken,c,\n"
+                "author@test.com,first,c,\n"
+            )
+            file.flush()
+            stdout, stderr = StringIO(), StringIO()
+            call_command(
+                "bulk_import_posts",
+                file.name,
+                chunk_size=2,
+                stdout=stdout,
+                stderr=stderr,
+            )
+
+        self.assertIn("Imported 2 posts, rejected 3 rows", stdout.getvalue())
+        self.assertEqual(
+            [line.split(":")[0] for line in stderr.getvalue().splitlines()],
+            ["Line 4", "Line 5", "Line 6"],
+        )
+        first = Post.objects.get(title="first")
+        self.assertEqual(
+            sorted(first.hashtags.values_list("name", flat=True)),
+            ["api", "django", "web"],
+        )
+        self.assertEqual(Post.objects.get(title="second").user, self.follower)
+
+    def test_malformed_jsonl_lines_are_reported(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as file:
+            file.write(
+                json.dumps({"user": "author@test.com", "title": "a"})[:-1]
+                + "\n"
+                + json.dumps(
+                    {"user": "author@test.com", "title": "b", "content": "c"}
+                )
+                + "\n"
+            )
+            file.flush()
+            stdout, stderr = StringIO(), StringIO()
+            call_command(
+                "bulk_import_posts", file.name, stdout=stdout, stderr=stderr
+            )
+
+        self.assertIn("Imported 1 posts, rejected 1 rows", stdout.getvalue())
+        number, errors = stderr.getvalue().split(": ", 1)
+        self.assertEqual(number, "Line 1")
+        self.assertRegex(
+            json.loads(errors)["non_field_errors"][0],
+            r"^Invalid JSON: .* \(char \d+\)$",
+        )
+
+    def test_batch_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        posts = [
+            {"title": "one", "content": "#a #b"},
+            {"title": "two", "content": "#a", "user": self.follower.id},
+            {"title": "one", "content": "again"},
+            {"content": "untitled"},
+        ]
+
+        with self.assertNumQueries(9):
+            response = client.post(
+                reverse("social_media:post-bulk-create"),
+                {"posts": posts},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["created"]), 2)
+        self.assertEqual(
+            [error["index"] for error in response.data["errors"]], [2, 3]
+        )
+        authors = Post.objects.filter(title__in=["one", "two"]).values_list(
+            "user", flat=True
+        )
+        self.assertEqual(set(authors), {self.user.id})
+
+        run_pending()
+        self.assertEqual(
+            self.follower.timeline_entries.filter(
+                post_id__in=response.data["created"]
+            ).count(),
+            2,
+        )
+        self.assertEqual(HashtagUsage.objects.get(hashtag__name="a").count, 2)
+
+
+@contextmanager
+def replica_alias(alias="replica"):
+    """
+    A database alias mirroring `default` through its own connection
+    wrapper, so queries are captured per alias but see the test's data.
+    """
+    default = connections["default"]
+    default.ensure_connection()
+    connections.settings[alias] = default.settings_dict
+    replica = connections.create_connection(alias)
+    replica.connection = default.connection
+    connections[alias] = replica
+    try:
+        yield replica
+    finally:
+        # The raw connection belongs to `default`: do not close it.
+        replica.connection = None
+        del connections[alias]
+        del connections.settings[alias]
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "user@test.com", "pass12345"
+        )
+        Post.objects.create(title="post", content="c", user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("social_media:post-list")
+        self.replica = self.enterContext(replica_alias())
+        self.enterContext(
+            self.settings(DATABASE_REPLICAS=["replica"], REPLICA_PIN_TIMEOUT=1)
+        )
+
+    def list_reads(self):
+        """Queries of a post list request on the primary and the replica"""
+        with CaptureQueriesContext(connection) as primary:
+            with CaptureQueriesContext(self.replica) as replica:
+                response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def test_reads_go_to_the_replica_and_writes_to_the_primary(self):
+        primary, replica = self.list_reads()
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+        with CaptureQueriesContext(self.replica) as replica:
+            response = self.client.post(
+                self.url, {"title": "new", "content": "c"}
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(replica.captured_queries)
+        self.assertEqual(ReplicaRouter().db_for_write(Post), "default")
+
+    def test_writers_read_from_the_primary_until_the_pin_expires(self):
+        self.client.post(self.url, {"title": "new", "content": "c"})
+        primary, replica = self.list_reads()
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        time.sleep(1.1)
+        primary, replica = self.list_reads()
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = sample_social_graph()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+        self.post = Post.objects.first()
+
+    def test_server_timing_and_histograms_per_action(self):
+        response = self.client.get(
+            reverse("social_media:post-like", args=[self.post.id])
+        )
+
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertNotIn('desc="0 queries"', response["Server-Timing"])
+        self.assertIn("total;dur=", response["Server-Timing"])
+        # The recorder only wraps connections for the request's duration.
+        self.assertNotIn(record_query, connection.execute_wrappers)
+        with self.settings(DEBUG=True):
+            metrics = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn(
+            'http_request_db_queries_count{view="PostViewSet.like",'
+            'method="GET"}',
+            metrics,
+        )
+
+    def test_values_row_lists_record_serialize_time(self):
+        histogram = HISTOGRAMS["serialize_time"]
+        labels = ("PostViewSet.list", "GET")
+
+        def total():
+            return histogram._series.get(labels, (None, 0.0))[1]
+
+        before = total()
+        response = self.client.get(reverse("social_media:post-list"))
+
+        self.assertIn("serialize;dur=", response["Server-Timing"])
+        self.assertGreater(total(), before)
+
+    def test_slow_queries_are_logged_with_their_view(self):
+        metrics = {"SLOW_QUERY_MS": 0, "SLOW_QUERY_SAMPLE_RATE": 1.0}
+        with self.settings(METRICS={"TOKEN": None, **metrics}):
+            with self.assertLogs(
+                "Social_Media_API.metrics.slow_queries"
+            ) as logs:
+                self.client.get(reverse("social_media:post-list"))
+
+        self.assertIn("PostViewSet.list", logs.output[0])
+
+    def test_metrics_token(self):
+        with self.settings(METRICS={"TOKEN": None}):
+            response = self.client.get(reverse("metrics"))
+            self.assertEqual(response.status_code, 403)
 
-# Create your tests here.
+        with self.settings(METRICS={"TOKEN": "secret"}):
+            response = self.client.get(reverse("metrics"))
+            self.assertEqual(response.status_code, 403)
+            response = self.client.get(
+                reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+            )
+            self.assertEqual(response.status_code, 200)
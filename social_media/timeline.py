@@ -0,0 +1,145 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F, Q
+
+from social_media.models import Post, TimelineEntry
+from tasks.queue import task
+from user.models import Follow
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def fan_out_on_read_authors(user_ids):
+    """Users among `user_ids` whose posts are not written to timelines"""
+    return get_user_model().objects.filter(
+        id__in=user_ids, follower_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    )
+
+
+def is_fanned_out_on_read(author) -> bool:
+    return fan_out_on_read_authors([author.id]).exists()
+
+
+@task(priority=10)
+def fan_out_post(post_id) -> None:
+    """Write a new post to the timeline of every follower of its author"""
+    post = Post.objects.select_related("user").filter(id=post_id).first()
+    if post is None or is_fanned_out_on_read(post.user):
+        return
+
+    follower_ids = Follow.objects.filter(
+        followee_id=post.user_id
+    ).values_list("follower_id", flat=True)
+    batch = []
+    for follower_id in follower_ids.iterator(chunk_size=FANOUT_BATCH_SIZE):
+        batch.append(
+            TimelineEntry(
+                owner_id=follower_id,
+                post_id=post.id,
+                author_id=post.user_id,
+                created_at=post.created_at,
+            )
+        )
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill_timeline(owner_id, author_ids) -> None:
+    """Copy the latest posts of newly followed authors into a timeline"""
+    author_ids = list(author_ids)
+    if not author_ids:
+        return
+
+    posts = (
+        Post.objects.filter(user_id__in=author_ids)
+        .exclude(user__in=fan_out_on_read_authors(author_ids).values("id"))
+        .order_by("-created_at", "-id")
+        .values_list("id", "user_id", "created_at")
+    )
+
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                owner_id=owner_id,
+                post_id=post_id,
+                author_id=author_id,
+                created_at=created_at,
+            )
+            for post_id, author_id, created_at in posts[
+                : settings.TIMELINE_BACKFILL_SIZE
+            ]
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def trim_timeline(owner_id, author_ids) -> None:
+    """Drop the posts of unfollowed authors from a timeline"""
+    TimelineEntry.objects.filter(
+        owner_id=owner_id, author__in=author_ids
+    ).delete()
+
+
+@task(priority=10)
+def sync_timeline(owner_id, author_ids) -> None:
+    """
+    Backfill or trim the posts of `author_ids` in a timeline, depending on
+    whether the owner follows them by the time this runs. Follow and
+    unfollow tasks of the same authors can therefore run in any order.
+    """
+    followed = set(
+        Follow.objects.filter(
+            follower_id=owner_id, followee_id__in=author_ids
+        ).values_list("followee_id", flat=True)
+    )
+    backfill_timeline(owner_id, followed)
+    trim_timeline(
+        owner_id,
+        [author_id for author_id in author_ids if author_id not in followed],
+    )
+
+
+def timeline_posts(owner):
+    """
+    Posts for the home timeline of `owner`.
+
+    When none of the followed accounts is fanned out on read this is a
+    single range scan over the owner's timeline index; otherwise the posts
+    of those accounts are merged in from the posts table.
+    """
+    on_read_authors = list(_on_read_followees(owner))
+    return _timeline_queryset(owner, on_read_authors)
+
+
+async def atimeline_posts(owner):
+    """`timeline_posts` resolving the followed accounts with the async ORM"""
+    on_read_authors = [
+        author_id async for author_id in _on_read_followees(owner)
+    ]
+    return _timeline_queryset(owner, on_read_authors)
+
+
+def _on_read_followees(owner):
+    return fan_out_on_read_authors(
+        Follow.objects.filter(follower=owner).values("followee_id")
+    ).values_list("id", flat=True)
+
+
+def _timeline_queryset(owner, on_read_authors):
+    if not on_read_authors:
+        return (
+            Post.objects.filter(timeline_entries__owner=owner)
+            .annotate(
+                feed_created_at=F("timeline_entries__created_at"),
+                feed_post_id=F("timeline_entries__post_id"),
+            )
+            .order_by("-feed_created_at", "-feed_post_id")
+        )
+
+    entries = TimelineEntry.objects.filter(owner=owner).values("post_id")
+    return Post.objects.filter(
+        Q(id__in=entries) | Q(user_id__in=on_read_authors)
+    ).order_by("-created_at", "-id")
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework import routers
 
+from social_media.async_views import post_detail
 from social_media.views import (
     PostViewSet,
     CommentSetView,
@@ -20,6 +21,9 @@ urlpatterns = [
         CommentCreateView.as_view(),
         name="comment_create",
     ),
+    path(
+        "posts/<int:pk>/async/", post_detail, name="post-detail-async"
+    ),
 ]
 
 app_name = "social_media"
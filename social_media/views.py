@@ -1,70 +1,263 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, generics, status, mixins
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from Social_Media_API.db_routing import ReplicaReadMixin
+from Social_Media_API.metrics import timed_serialization
+from social_media.cache import (
+    get_or_compute,
+    post_detail_key,
+    post_namespace,
+)
+from social_media.conditional import (
+    ConditionalGetMixin,
+    ConditionalPageMixin,
+    instance_etag,
+    instance_validators,
+    make_etag,
+)
+from social_media.hashtags import filter_by_hashtags, trending_hashtags
+from social_media.imports import import_chunk
+from social_media.likes import like_posts, unlike_posts, user_likes
 from social_media.models import Post, Comment, Hashtag
+from social_media.pagination import PostCursorPagination
+from social_media.rows import PostValuesListMixin
+from social_media.search import search_posts
+from social_media.timeline import fan_out_post
 from social_media.serializers import (
     PostListSerializer,
     PostDetailSerializer,
     CommentListSerializer,
     HashtagSerializer,
     PostSerializer,
+    BulkLikeSerializer,
+    BulkPostCreateSerializer,
+    CommentSerializer,
+    TrendingHashtagSerializer,
 )
 from user.permissions import IsStaffOrReadOnly
 
 
-def ids_from_string(string_ids: str) -> list:
-    return [int(str_id) for str_id in string_ids.split(",")]
+TRENDING_MAX_HOURS = 24 * 7
+TRENDING_MAX_LIMIT = 50
+TRENDING_CACHE_TIMEOUT = 60
+
+
+def bounded_int_param(request, name: str, default: int, maximum: int) -> int:
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        value = default
+
+    return max(1, min(value, maximum))
+
+
+def liked_by_me(request, pk, data: dict) -> dict:
+    """Add the per user `liked_by_me` to a shared post detail payload"""
+    fields = PostDetailSerializer.requested_fields(request)
+    if fields is not None and "liked_by_me" not in fields:
+        return data
 
+    return {
+        **data,
+        "liked_by_me": user_likes(request.user, [pk]).exists(),
+    }
 
-class PostViewSet(viewsets.ModelViewSet):
+
+class PostViewSet(
+    ConditionalPageMixin,
+    ReplicaReadMixin,
+    PostValuesListMixin,
+    viewsets.ModelViewSet,
+):
     serializer_class = PostSerializer
     queryset = Post.objects.all()
     permission_classes = (IsAuthenticated,)
+    pagination_class = PostCursorPagination
+    # Detail payloads are cached for every user, so a lagging replica
+    # would pin a stale copy until the next invalidation.
+    replica_actions = ("list",)
+    # Set per action, see Social_Media_API/throttling.py.
+    throttle_scope = None
 
     def get_queryset(self):
         hashtags = self.request.query_params.get("hashtags")
-        queryset = self.queryset.prefetch_related("hashtags", "liked_by")
+        queryset = self.queryset
+
+        if self.action == "retrieve":
+            latest_comments = Comment.objects.order_by("-created_at", "-id")
+            queryset = queryset.prefetch_related(
+                "hashtags",
+                Prefetch(
+                    "comments",
+                    queryset=latest_comments[
+                        : settings.POST_DETAIL_COMMENT_LIMIT
+                    ],
+                    to_attr="latest_comments",
+                ),
+            )
+        else:
+            queryset = queryset.with_liked_by_me(
+                self.request.user
+            ).prefetch_related("hashtags")
 
         if hashtags:
-            hashtags_ids = ids_from_string(hashtags)
-            queryset = queryset.filter(hashtags__id__in=hashtags_ids)
+            mode = self.request.query_params.get("hashtags_mode", "any")
+            if mode not in ("all", "any"):
+                raise ValidationError(
+                    {"hashtags_mode": 'Must be "all" or "any".'}
+                )
+            queryset = filter_by_hashtags(
+                queryset, hashtags.split(","), match_all=mode == "all"
+            )
 
-        return queryset.distinct()
+        return queryset
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # The fan-out is queued only if the post commits.
+        with transaction.atomic():
+            post = serializer.save(user=self.request.user)
+            fan_out_post.delay(post.id)
+
+    def retrieve_validators(self):
+        return instance_validators(Post.objects.all(), self.kwargs["pk"])
 
     def get_serializer_class(self):
-        if self.action == "list":
+        if self.action in ("list", "search"):
             return PostListSerializer
 
         if self.action == "retrieve":
             return PostDetailSerializer
 
+        if self.action == "bulk_like":
+            return BulkLikeSerializer
+
+        if self.action == "bulk_create":
+            return BulkPostCreateSerializer
+
+        if self.action == "comments":
+            return CommentSerializer
+
         return self.serializer_class
 
-    @action(detail=True, methods=["get"])
+    @action(detail=True, methods=["get"], throttle_scope="like")
     def like(self, request, pk=None):
         """
         Add the current user to the 'liked_by' ManyToManyField for the post.
         """
         post = self.get_object()
-        post.liked_by.add(request.user)
+        like_posts(request.user, [post.id])
         return Response({"detail": "Post liked successfully."})
 
-    @action(detail=True, methods=["get"])
+    @action(detail=True, methods=["get"], throttle_scope="like")
     def unlike(self, request, pk=None):
         """
         Remove the current user from the 'liked_by' ManyToManyField for the post.
         """
         post = self.get_object()
-        post.liked_by.remove(request.user)
+        unlike_posts(request.user, [post.id])
         return Response({"detail": "Post unliked successfully."})
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "q",
+                type={"type": "string"},
+                description=(
+                    "Words to find in post title or content, each matched "
+                    "as a prefix, example: ?q=django rest"
+                ),
+            )
+        ]
+    )
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """Posts ranked by relevance to the `q` query"""
+        query = request.query_params.get("q", "")
+        queryset = search_posts(self.get_queryset(), query)
+        return self.values_page_response(queryset.order_by("-rank", "-id"))
+
+    @action(detail=True, methods=["get"])
+    def comments(self, request, pk=None):
+        """Comments of the post, newest first, cursor paginated"""
+        post = get_object_or_404(Post.objects.only("id"), pk=pk)
+        page = self.paginate_queryset(Comment.objects.filter(post=post))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=["post"], throttle_scope="like")
+    def bulk_like(self, request):
+        """
+        Like or unlike many posts in one transaction.
+        Returns the ids of the posts whose state actually changed.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        post_ids = serializer.validated_data["posts"]
+        liked = serializer.validated_data["liked"]
+
+        if liked:
+            changed = like_posts(request.user, post_ids)
+        else:
+            changed = unlike_posts(request.user, post_ids)
+
+        return Response({"liked": liked, "posts": changed})
+
+    @action(detail=False, methods=["post"], throttle_scope="post_batch")
+    def bulk_create(self, request):
+        """
+        Create up to 500 posts of the current user in one request. Invalid
+        posts are skipped and reported by their index in `posts`.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = import_chunk(
+            list(enumerate(serializer.validated_data["posts"])),
+            user=request.user,
+        )
+
+        return Response(
+            {
+                "created": result.created,
+                "errors": [
+                    {"index": index, "errors": errors}
+                    for index, errors in result.errors
+                ],
+            },
+            status=(
+                status.HTTP_201_CREATED
+                if result.created
+                else status.HTTP_400_BAD_REQUEST
+            ),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        entry = get_or_compute(
+            post_namespace(kwargs["pk"]),
+            post_detail_key(
+                request, PostDetailSerializer.requested_fields(request)
+            ),
+            self._retrieve_entry,
+        )
+        self.conditional_validators = entry["validators"]
+        return Response(liked_by_me(request, kwargs["pk"], entry["data"]))
+
+    def _retrieve_entry(self):
+        instance = self.get_object()
+        with timed_serialization():
+            data = self.get_serializer(instance).data
+        return {
+            "validators": (instance_etag(instance), instance.updated_at),
+            "data": data,
+        }
+
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         if instance.user != self.request.user:
@@ -97,10 +290,17 @@ class PostViewSet(viewsets.ModelViewSet):
         parameters=[
             OpenApiParameter(
                 "hashtags",
-                type={"type": "list", "items": {"type": "number"}},
-                description=("Filter by containing hashtag id, "
-                             "example: ?hashtags=1,2")
-            )
+                type={"type": "list", "items": {"type": "string"}},
+                description=("Filter by containing hashtag ids or names, "
+                             "example: ?hashtags=1,django")
+            ),
+            OpenApiParameter(
+                "hashtags_mode",
+                type={"type": "string", "enum": ["any", "all"]},
+                description=("Whether posts must contain any (default) "
+                             "or all of the hashtags, example: "
+                             "?hashtags=1,2&hashtags_mode=all")
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
@@ -132,13 +332,80 @@ class CommentCreateView(generics.CreateAPIView):
     queryset = Comment.objects.all()
     serializer_class = CommentListSerializer
     permission_classes = (IsAuthenticated,)
+    throttle_scope = "comment"
 
     def perform_create(self, serializer):
         post_id = self.kwargs.get("pk")
         serializer.save(user=self.request.user, post_id=post_id)
 
 
-class HashtagViewSet(viewsets.ModelViewSet):
+class HashtagViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Hashtag.objects.all()
     serializer_class = HashtagSerializer
     permission_classes = [IsStaffOrReadOnly]
+
+    def list(self, request, *args, **kwargs):
+        payload = self._cached_list_payload(request, *args, **kwargs)
+        self.conditional_validators = make_etag(payload), None
+        return Response(payload)
+
+    def list_validators(self):
+        # The list is small and cached: its digest is the cheapest validator
+        # that also catches deletions.
+        return make_etag(self._cached_list_payload(self.request)), None
+
+    def _cached_list_payload(self, request, *args, **kwargs):
+        return get_or_compute(
+            "hashtags",
+            f"list:{request.get_host()}:{request.get_full_path()}",
+            lambda: super(HashtagViewSet, self)
+            .list(request, *args, **kwargs)
+            .data,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        self.conditional_validators = (
+            instance_etag(instance),
+            instance.updated_at,
+        )
+        return Response(self.get_serializer(instance).data)
+
+    def retrieve_validators(self):
+        return instance_validators(Hashtag.objects.all(), self.kwargs["pk"])
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "hours",
+                type={"type": "number"},
+                description=(
+                    "Length of the sliding window in hours, "
+                    f"at most {TRENDING_MAX_HOURS}, default 24"
+                ),
+            ),
+            OpenApiParameter(
+                "limit",
+                type={"type": "number"},
+                description=(
+                    "Number of hashtags, "
+                    f"at most {TRENDING_MAX_LIMIT}, default 10"
+                ),
+            ),
+        ],
+        responses=TrendingHashtagSerializer(many=True),
+    )
+    @action(detail=False, methods=["get"])
+    def trending(self, request):
+        """Most used hashtags over a sliding window of hourly counters"""
+        hours = bounded_int_param(request, "hours", 24, TRENDING_MAX_HOURS)
+        limit = bounded_int_param(request, "limit", 10, TRENDING_MAX_LIMIT)
+        payload = get_or_compute(
+            "hashtags",
+            f"trending:{hours}:{limit}",
+            lambda: TrendingHashtagSerializer(
+                trending_hashtags(hours, limit), many=True
+            ).data,
+            timeout=TRENDING_CACHE_TIMEOUT,
+        )
+        return Response(payload)
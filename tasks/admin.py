@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from tasks.models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "priority", "attempts", "run_at")
+    list_filter = ("status", "name")
+    readonly_fields = ("locked_by", "locked_at", "last_error", "created_at")
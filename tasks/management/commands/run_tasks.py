@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from tasks.worker import Worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Worker threads, each with its own database connection",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once no task is due instead of polling for more",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help='Seconds between polls when idle (TASKS["POLL_INTERVAL"])',
+        )
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+        base_name = Worker().name
+
+        def work(index):
+            worker = Worker(f"{base_name}-{index}", stop_event)
+            try:
+                return worker.work(
+                    burst=options["burst"],
+                    poll_interval=options["poll_interval"],
+                )
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(
+            max_workers=options["concurrency"], thread_name_prefix="tasks"
+        ) as executor:
+            futures = [
+                executor.submit(work, index)
+                for index in range(options["concurrency"])
+            ]
+            try:
+                ran = sum(future.result() for future in futures)
+            except KeyboardInterrupt:
+                # Let the running tasks finish, then stop.
+                stop_event.set()
+                ran = sum(future.result() for future in futures)
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {ran} tasks"))
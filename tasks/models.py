@@ -0,0 +1,53 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """
+    A queued call of a `@task` function. Done tasks are deleted, failed
+    ones stay for inspection until they are retried or removed.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (FAILED, "Failed"),
+    )
+
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(
+        max_length=7, choices=STATUS_CHOICES, default=QUEUED
+    )
+    dedup_key = models.CharField(max_length=64, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # At most one queued copy of the same call: enqueuing it again
+            # is a no-op until a worker picks it up.
+            models.UniqueConstraint(
+                fields=["dedup_key"],
+                condition=models.Q(status="queued"),
+                name="task_queued_dedup_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["status", "-priority", "run_at"],
+                name="task_status_priority_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name}{tuple(self.args)} [{self.status}]"
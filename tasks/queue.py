@@ -0,0 +1,112 @@
+"""
+A small database-backed task queue.
+
+Side effects that do not have to finish before a response is sent are
+declared with `@task` and enqueued with `.delay(*args)`. The task row is
+written in the caller's transaction, so it is queued exactly when the
+write that needs it commits and is dropped with it on rollback. Workers
+(`manage.py run_tasks`) run queued tasks by priority, retry failures with
+exponential backoff, and a task enqueued again while an identical call is
+still queued is deduplicated. Delivery is at least once: tasks must be
+idempotent.
+
+With TASKS["EAGER"] set, `.delay()` runs the task inline instead.
+Otherwise the first enqueue of each process warns when tasks have been
+due for over TASKS["STALE_AFTER"] seconds, as when no worker runs.
+"""
+import functools
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+_backlog_checked = False
+
+
+def warn_if_unattended() -> None:
+    """Log, once per process, when queued tasks are long overdue"""
+    global _backlog_checked
+    if _backlog_checked:
+        return
+
+    _backlog_checked = True
+    stale_before = timezone.now() - timedelta(
+        seconds=settings.TASKS["STALE_AFTER"]
+    )
+    stale = Task.objects.filter(
+        status=Task.QUEUED, run_at__lt=stale_before
+    ).count()
+    if stale:
+        logger.warning(
+            "%d tasks have been due for over %d seconds: is "
+            "`manage.py run_tasks` running? Set TASKS_EAGER=1 to run tasks "
+            "inline instead.",
+            stale,
+            settings.TASKS["STALE_AFTER"],
+        )
+
+
+class TaskFunction:
+    def __init__(self, func, priority: int, max_attempts: int, dedup: bool):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.dedup = dedup
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+    def dedup_key(self, args) -> str:
+        payload = json.dumps([self.name, args], cls=DjangoJSONEncoder)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def delay(self, *args, priority=None, run_at=None) -> None:
+        """Queue a call with JSON serializable `args`"""
+        self.delay_many([args], priority=priority, run_at=run_at)
+
+    def delay_many(self, calls, priority=None, run_at=None) -> None:
+        """Queue one call per tuple of args in `calls`, in one insert"""
+        if settings.TASKS["EAGER"]:
+            for args in calls:
+                self.func(*args)
+            return
+
+        warn_if_unattended()
+        run_at = run_at or timezone.now()
+        tasks = []
+        for args in calls:
+            args = json.loads(json.dumps(list(args), cls=DjangoJSONEncoder))
+            tasks.append(
+                Task(
+                    name=self.name,
+                    args=args,
+                    priority=self.priority if priority is None else priority,
+                    max_attempts=self.max_attempts,
+                    dedup_key=self.dedup_key(args) if self.dedup else None,
+                    run_at=run_at,
+                )
+            )
+
+        Task.objects.bulk_create(tasks, ignore_conflicts=True)
+
+
+def task(priority: int = 0, max_attempts: int = 3, dedup: bool = True):
+    """
+    Declare a task. Higher priorities run first. With `dedup`, identical
+    calls queued before a worker picks them up run once.
+    """
+
+    def decorator(func):
+        return TaskFunction(func, priority, max_attempts, dedup)
+
+    return decorator
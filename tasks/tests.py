@@ -0,0 +1,177 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from social_media.models import Post, TimelineEntry
+from social_media.timeline import fan_out_post
+from tasks.models import Task
+from tasks import queue
+from tasks.queue import task
+from tasks.worker import Worker, run_pending
+from user.graph import follow_users, unfollow_users
+
+calls = []
+
+
+@task()
+def record_call(label):
+    calls.append(label)
+
+
+@task(priority=5)
+def urgent_call(label):
+    calls.append(label)
+
+
+@task(max_attempts=2)
+def broken_call():
+    raise RuntimeError("broken")
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_identical_queued_calls_run_once(self):
+        record_call.delay("a")
+        record_call.delay("a")
+        record_call.delay("b")
+
+        self.assertEqual(Task.objects.count(), 2)
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(sorted(calls), ["a", "b"])
+        self.assertFalse(Task.objects.exists())
+
+    def test_higher_priorities_run_first(self):
+        record_call.delay("low")
+        urgent_call.delay("high")
+        record_call.delay("highest", priority=10)
+
+        run_pending()
+
+        self.assertEqual(calls, ["highest", "high", "low"])
+
+    def test_failures_back_off_then_stay_failed(self):
+        broken_call.delay()
+
+        with self.assertLogs("tasks.worker", "WARNING"):
+            self.assertEqual(run_pending(), 1)
+        queued = Task.objects.get()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn("RuntimeError", queued.last_error)
+        # Not due yet.
+        self.assertEqual(run_pending(), 0)
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs("tasks.worker", "ERROR"):
+            run_pending()
+        failed = Task.objects.get()
+        self.assertEqual(failed.status, Task.FAILED)
+        self.assertEqual(failed.attempts, 2)
+
+    def test_follow_events_sync_the_timeline(self):
+        user, author = (
+            get_user_model().objects.create_user(email, "pass12345")
+            for email in ("user@test.com", "author@test.com")
+        )
+        post = Post.objects.create(title="t", content="c", user=author)
+
+        follow_users(user, [author.id])
+        unfollow_users(user, [author.id])
+        follow_users(user, [author.id])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+        run_pending()
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list("owner", "post")),
+            [(user.id, post.id)],
+        )
+
+
+class UnattendedQueueTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(queue, "_backlog_checked", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stale_tasks_are_reported_once_per_process(self):
+        Task.objects.create(
+            name=record_call.name,
+            args=["a"],
+            run_at=timezone.now() - timedelta(hours=1),
+        )
+
+        with self.assertLogs("tasks.queue", "WARNING") as logs:
+            record_call.delay("b")
+            record_call.delay("c")
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("1 tasks have been due", logs.output[0])
+
+    def test_nothing_is_reported_when_tasks_are_picked_up(self):
+        record_call.delay("a")
+        with self.assertNoLogs("tasks.queue"):
+            record_call.delay("b")
+
+
+class RunTasksCommandTests(TransactionTestCase):
+    def test_database_errors_do_not_stop_the_worker(self):
+        calls.clear()
+        record_call.delay("a")
+        worker = Worker()
+        claim = worker.claim
+        errors = iter([OperationalError("database is locked")])
+
+        def flaky_claim():
+            for error in errors:
+                raise error
+            return claim()
+
+        worker.claim = flaky_claim
+        with self.assertLogs("tasks.worker", "ERROR") as logs:
+            ran = worker.work(burst=True, poll_interval=0)
+
+        self.assertIn("database error", logs.output[0])
+        self.assertEqual(ran, 1)
+        self.assertEqual(calls, ["a"])
+
+    def test_burst_drains_the_queue(self):
+        author = get_user_model().objects.create_user(
+            "author@test.com", "pass12345"
+        )
+        follower = get_user_model().objects.create_user(
+            "follower@test.com", "pass12345"
+        )
+        follower.following.add(author)
+        post = Post.objects.create(title="t", content="c", user=author)
+        fan_out_post.delay(post.id)
+        Task.objects.create(
+            name="tasks.tests.record_call",
+            args=["stale"],
+            status=Task.RUNNING,
+            locked_at=timezone.now() - timedelta(days=1),
+        )
+
+        # SQLite locks the whole table: concurrent workers would only
+        # wait on each other, or fail with "database table is locked".
+        concurrency = 2 if connection.features.has_select_for_update else 1
+        stdout = StringIO()
+        call_command(
+            "run_tasks",
+            "--burst",
+            f"--concurrency={concurrency}",
+            stdout=stdout,
+        )
+
+        self.assertIn("Ran 2 tasks", stdout.getvalue())
+        self.assertFalse(Task.objects.exists())
+        self.assertTrue(
+            TimelineEntry.objects.filter(owner=follower, post=post).exists()
+        )
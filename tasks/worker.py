@@ -0,0 +1,177 @@
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (
+    DatabaseError,
+    IntegrityError,
+    close_old_connections,
+    transaction,
+)
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+CLAIM_CANDIDATES = 10
+# Longest wait between retries while the database keeps failing.
+MAX_ERROR_BACKOFF = 60
+
+
+class Worker:
+    """Claims queued tasks one at a time and runs them"""
+
+    def __init__(self, name: str = "", stop_event=None):
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.stop_event = stop_event or threading.Event()
+
+    def claim(self):
+        """
+        Lock the next due task by flipping it to running. The update only
+        matches a still queued row, so concurrent workers never share one.
+        """
+        now = timezone.now()
+        candidates = (
+            Task.objects.filter(status=Task.QUEUED, run_at__lte=now)
+            .order_by("-priority", "run_at", "id")
+            .values_list("id", flat=True)[:CLAIM_CANDIDATES]
+        )
+        for task_id in candidates:
+            claimed = Task.objects.filter(
+                id=task_id, status=Task.QUEUED
+            ).update(
+                status=Task.RUNNING,
+                locked_by=self.name,
+                locked_at=now,
+                attempts=F("attempts") + 1,
+            )
+            if claimed:
+                return Task.objects.get(id=task_id)
+
+        return None
+
+    def run(self, task) -> bool:
+        """Run a claimed task atomically, returning whether it succeeded"""
+        try:
+            function = import_string(task.name)
+            with transaction.atomic():
+                function(*task.args)
+        except Exception:
+            logger.warning("Task %s failed", task, exc_info=True)
+            self.fail(task, traceback.format_exc())
+            return False
+
+        Task.objects.filter(id=task.id).delete()
+        return True
+
+    def fail(self, task, error: str, backoff: bool = True) -> None:
+        if task.attempts >= task.max_attempts:
+            Task.objects.filter(id=task.id).update(
+                status=Task.FAILED,
+                locked_by="",
+                locked_at=None,
+                last_error=error,
+            )
+            logger.error(
+                "Task %s gave up after %s attempts", task, task.attempts
+            )
+            return
+
+        delay = 0
+        if backoff:
+            delay = settings.TASKS["RETRY_DELAY"] * 2 ** (task.attempts - 1)
+        self._requeue(
+            task.id,
+            run_at=timezone.now() + timedelta(seconds=delay),
+            last_error=error,
+        )
+
+    def requeue_stale(self) -> None:
+        """Retry the tasks of workers that died holding them"""
+        expired = timezone.now() - timedelta(
+            seconds=settings.TASKS["LEASE_TIMEOUT"]
+        )
+        stale = Task.objects.filter(
+            status=Task.RUNNING, locked_at__lt=expired
+        )
+        for task in stale:
+            self.fail(
+                task, f"Lease of {task.locked_by} expired", backoff=False
+            )
+
+    @staticmethod
+    def _requeue(task_id, **fields) -> None:
+        try:
+            with transaction.atomic():
+                Task.objects.filter(id=task_id).update(
+                    status=Task.QUEUED, locked_by="", locked_at=None, **fields
+                )
+        except IntegrityError:
+            # The same call was queued again meanwhile and will run anyway.
+            Task.objects.filter(id=task_id).delete()
+
+    def work(self, burst: bool = False, poll_interval=None) -> int:
+        """
+        Run tasks until stopped, or until none is due with `burst`, and
+        return how many ran.
+        """
+        if poll_interval is None:
+            poll_interval = settings.TASKS["POLL_INTERVAL"]
+
+        ran = 0
+        errors = 0
+        requeue = True
+        while not self.stop_event.is_set():
+            try:
+                if requeue:
+                    self.requeue_stale()
+                    requeue = False
+                task = self.claim()
+                if task is not None:
+                    self.run(task)
+            except DatabaseError:
+                # A task caught between claim and finish keeps its lease
+                # and is retried once requeue_stale finds it expired.
+                errors += 1
+                delay = min(
+                    poll_interval * 2 ** (errors - 1), MAX_ERROR_BACKOFF
+                )
+                logger.exception(
+                    "Worker %s hit a database error, retrying in %ss",
+                    self.name,
+                    delay,
+                )
+                close_old_connections()
+                self.stop_event.wait(delay)
+                continue
+
+            errors = 0
+            if task is None:
+                if burst:
+                    break
+                self.stop_event.wait(poll_interval)
+                requeue = True
+                continue
+
+            ran += 1
+            close_old_connections()
+
+        return ran
+
+
+def run_pending() -> int:
+    """Run every due task in this thread, e.g. from tests"""
+    worker = Worker()
+    ran = 0
+    while (task := worker.claim()) is not None:
+        worker.run(task)
+        ran += 1
+
+    return ran
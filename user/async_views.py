@@ -0,0 +1,25 @@
+from social_media.async_views import async_api_view, post_page_response
+from social_media.models import Post
+from social_media.timeline import atimeline_posts
+
+
+@async_api_view
+async def user_posts(request):
+    """Async `UserPostsView`"""
+    return await post_page_response(
+        request, Post.objects.filter(user=request.user)
+    )
+
+
+@async_api_view
+async def following_posts(request):
+    """Async `FollowingPostsView`"""
+    return await post_page_response(
+        request, await atimeline_posts(request.user)
+    )
+
+
+@async_api_view
+async def liked_posts(request):
+    """Async `LikedPostsView`"""
+    return await post_page_response(request, request.user.liked_posts.all())
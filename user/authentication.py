@@ -0,0 +1,174 @@
+"""
+JWT authentication without a user query per request.
+
+Validated access tokens and a snapshot of their user (id, is_staff,
+is_active) are kept in bounded per-process LRU caches. Requests are
+authenticated as a `User` holding only the snapshot fields, which is
+enough for permission checks and ownership filters; reading any other
+field loads the whole row once. Saving or deleting a user evicts its
+snapshot in the process that did it, other processes pick the change up
+within AUTH_CACHE["TIMEOUT"] seconds.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+SNAPSHOT_FIELDS = ("id", "is_staff", "is_active")
+
+
+class LRUCache:
+    """Thread-safe bounded LRU mapping whose entries expire"""
+
+    def __init__(self, size: int, timeout: float):
+        self.size = size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None) -> None:
+        """Store `value` for `timeout` seconds, at most the cache timeout"""
+        if timeout is None or timeout > self.timeout:
+            timeout = self.timeout
+        if timeout <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = LRUCache(
+    settings.AUTH_CACHE["SIZE"], settings.AUTH_CACHE["TIMEOUT"]
+)
+user_cache = LRUCache(
+    settings.AUTH_CACHE["SIZE"], settings.AUTH_CACHE["TIMEOUT"]
+)
+
+
+def evict_user(user_id) -> None:
+    user_cache.delete(user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication serving tokens and users from the LRU caches"""
+
+    def get_validated_token(self, raw_token):
+        validated_token = token_cache.get(raw_token)
+        if validated_token is None:
+            validated_token = super().get_validated_token(raw_token)
+            token_cache.set(
+                raw_token,
+                validated_token,
+                timeout=validated_token["exp"] - time.time(),
+            )
+
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+
+        snapshot = user_cache.get(user_id)
+        if snapshot is None:
+            user = super().get_user(validated_token)
+            snapshot = {name: getattr(user, name) for name in SNAPSHOT_FIELDS}
+            user_cache.set(user_id, snapshot)
+            return user
+
+        if not snapshot["is_active"]:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+
+        return self.snapshot_user(snapshot)
+
+    def snapshot_user(self, snapshot):
+        """A user with the snapshot fields loaded and the others deferred"""
+        field_names = [
+            field.attname
+            for field in self.user_model._meta.concrete_fields
+            if field.attname in snapshot
+        ]
+        user = self.user_model.from_db(
+            None, field_names, [snapshot[name] for name in field_names]
+        )
+        user._load_row_on_access = True
+        return user
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """
+    JWT authentication for async views, fetching the user with `aget`.
+    Users are loaded whole: deferred fields cannot be read in async code.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            )
+
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+
+        return user
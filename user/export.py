@@ -0,0 +1,155 @@
+"""
+Account export as newline-delimited JSON.
+
+Records are produced one at a time from chunked server-side cursors and
+written out in bounded buffers, so memory use does not grow with the size
+of the account. Under ASGI the buffers are pulled one at a time through
+`aiterate`: Django would otherwise collect a sync stream into a list before
+sending it. Each line is an object whose `type` is one of "user",
+"post", "comment", "like", "following" or "follower".
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.text import compress_sequence
+
+from social_media.likes import Like
+from social_media.models import Comment, Post, PostHashtag
+from user.models import Follow, User
+
+_image_storage = Post._meta.get_field("image").storage
+
+
+def _image_url(name, request):
+    if not name:
+        return None
+
+    return request.build_absolute_uri(_image_storage.url(name))
+
+
+def _chunks(queryset):
+    """`queryset` rows as lists of at most EXPORT_CHUNK_SIZE"""
+    chunk = []
+    for row in queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) >= settings.EXPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+def _posts(user, request):
+    posts = (
+        Post.objects.filter(user=user)
+        .order_by("id")
+        .values("id", "title", "content", "image", "created_at", "updated_at")
+    )
+    for chunk in _chunks(posts):
+        # One hashtag query per chunk of posts.
+        hashtags = {row["id"]: [] for row in chunk}
+        links = (
+            PostHashtag.objects.filter(post_id__in=hashtags)
+            .order_by("id")
+            .values_list("post_id", "hashtag__name")
+        )
+        for post_id, name in links:
+            hashtags[post_id].append(name)
+
+        for row in chunk:
+            yield {
+                "type": "post",
+                **row,
+                "image": _image_url(row["image"], request),
+                "hashtags": hashtags[row["id"]],
+            }
+
+
+def export_records(user, request):
+    """Every record of the account of `user`"""
+    profile = (
+        User.objects.filter(id=user.id)
+        .values(
+            "id",
+            "email",
+            "first_name",
+            "last_name",
+            "date_joined",
+            "follower_count",
+            "following_count",
+        )
+        .get()
+    )
+    yield {"type": "user", **profile}
+    yield from _posts(user, request)
+
+    comments = (
+        Comment.objects.filter(user=user)
+        .order_by("id")
+        .values("id", "post_id", "content", "created_at")
+    )
+    for row in comments.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield {"type": "comment", **row}
+
+    likes = (
+        Like.objects.filter(user=user)
+        .order_by("id")
+        .values_list("post_id", flat=True)
+    )
+    for post_id in likes.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield {"type": "like", "post_id": post_id}
+
+    for record_type, edges, column in (
+        ("following", Follow.objects.filter(follower=user), "followee"),
+        ("follower", Follow.objects.filter(followee=user), "follower"),
+    ):
+        rows = edges.order_by("id").values_list(
+            f"{column}_id", f"{column}__email"
+        )
+        for user_id, email in rows.iterator(
+            chunk_size=settings.EXPORT_CHUNK_SIZE
+        ):
+            yield {"type": record_type, "user_id": user_id, "email": email}
+
+
+def ndjson_lines(records, buffer_size: int = 64 * 1024):
+    """Encode `records` as NDJSON, yielded in buffers of about `buffer_size`"""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    buffer = []
+    size = 0
+    for record in records:
+        line = (encoder.encode(record) + "\n").encode()
+        buffer.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+
+    if buffer:
+        yield b"".join(buffer)
+
+
+def export_stream(user, request, gzip: bool = False):
+    stream = ndjson_lines(export_records(user, request))
+    return compress_sequence(stream) if gzip else stream
+
+
+async def aiterate(iterator):
+    """
+    Yield the items of the sync `iterator` to async code, advancing it in
+    the request's sync thread, which holds its database cursors.
+    """
+    iterator = iter(iterator)
+    done = object()
+    advance = sync_to_async(next)
+    try:
+        while (item := await advance(iterator, done)) is not done:
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await sync_to_async(close)()
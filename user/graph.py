@@ -0,0 +1,122 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from social_media.timeline import sync_timeline
+from user.models import Follow, User
+
+
+def _counters(as_follower: bool) -> tuple:
+    """(own counter, other side's counter) of a follow edge"""
+    if as_follower:
+        return "following_count", "follower_count"
+
+    return "follower_count", "following_count"
+
+
+def adjust_follow_counts(
+    user_id, other_ids, as_follower: bool, delta: int
+) -> None:
+    """
+    Apply `delta` to the counters of edges between one user and `other_ids`:
+    `user_id` follows each of them when `as_follower`, else they follow it.
+    """
+    if not other_ids:
+        return
+
+    own_counter, _ = _counters(as_follower)
+    User.objects.filter(pk=user_id).update(
+        updated_at=timezone.now(),
+        **{own_counter: F(own_counter) + delta * len(other_ids)},
+    )
+    adjust_other_follow_counts(other_ids, as_follower, delta)
+
+
+def adjust_other_follow_counts(
+    other_ids, as_follower: bool, delta: int
+) -> None:
+    """
+    Only the `other_ids` side of `adjust_follow_counts`, for edges whose
+    user is gone.
+    """
+    if not other_ids:
+        return
+
+    _, other_counter = _counters(as_follower)
+    User.objects.filter(pk__in=other_ids).update(
+        updated_at=timezone.now(),
+        **{other_counter: F(other_counter) + delta},
+    )
+
+
+def recount_follows(user_ids) -> None:
+    """Recompute both follow counters from the Follow table for `user_ids`"""
+    for counter, column in (
+        ("follower_count", "followee"),
+        ("following_count", "follower"),
+    ):
+        edges = (
+            Follow.objects.filter(**{column: OuterRef("pk")})
+            .values(column)
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        User.objects.filter(pk__in=user_ids).update(
+            updated_at=timezone.now(),
+            **{counter: Coalesce(Subquery(edges), 0)},
+        )
+
+
+def following_ids(user_id, among) -> set:
+    """Ids in `among` that `user_id` follows, in a single query"""
+    return set(
+        Follow.objects.filter(
+            follower_id=user_id, followee_id__in=among
+        ).values_list("followee_id", flat=True)
+    )
+
+
+def _lock_user(user) -> None:
+    """Serialize the follow writes of one user so the diffs below are exact"""
+    list(User.objects.select_for_update().filter(id=user.id).values_list("id"))
+
+
+def follow_users(user, user_ids) -> list:
+    """Follow every user in `user_ids` and return the ids newly followed"""
+    with transaction.atomic():
+        _lock_user(user)
+        new_ids = list(
+            User.objects.filter(id__in=user_ids)
+            .exclude(id=user.id)
+            .exclude(follower_edges__follower_id=user.id)
+            .values_list("id", flat=True)
+        )
+        Follow.objects.bulk_create(
+            [
+                Follow(followee_id=followee_id, follower_id=user.id)
+                for followee_id in new_ids
+            ],
+            ignore_conflicts=True,
+        )
+        adjust_follow_counts(user.id, new_ids, True, 1)
+        if new_ids:
+            sync_timeline.delay(user.id, new_ids)
+
+    return new_ids
+
+
+def unfollow_users(user, user_ids) -> list:
+    """Unfollow every user in `user_ids` and return the ids newly unfollowed"""
+    with transaction.atomic():
+        _lock_user(user)
+        edges = Follow.objects.filter(
+            follower_id=user.id, followee_id__in=user_ids
+        )
+        removed_ids = list(edges.values_list("followee_id", flat=True))
+        edges.delete()
+        adjust_follow_counts(user.id, removed_ids, True, -1)
+        if removed_ids:
+            sync_timeline.delay(user.id, removed_ids)
+
+    return removed_ids
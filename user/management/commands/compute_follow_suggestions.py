@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user.suggestions import (
+    MAX_EXPANDED_DEGREE,
+    METHODS,
+    TOP_K,
+    compute_suggestions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the 'who to follow' suggestions of every user from the "
+        "follow graph, e.g. nightly from cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, default=TOP_K)
+        parser.add_argument(
+            "--method", choices=METHODS, default="adamic_adar"
+        )
+        parser.add_argument(
+            "--max-degree",
+            type=int,
+            default=MAX_EXPANDED_DEGREE,
+            help="Skip paths through accounts following more than this",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        stored = compute_suggestions(
+            top_k=options["top_k"],
+            method=options["method"],
+            max_degree=options["max_degree"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stored {stored} suggestions "
+                f"in {time.monotonic() - started:.1f}s"
+            )
+        )
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 17:52
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS user_email_trgm_idx "
+        "ON user_user USING GIN (lower(email) gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    schema_editor.execute("DROP INDEX IF EXISTS user_email_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_user_profile_picture'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='user_email_lower_idx'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
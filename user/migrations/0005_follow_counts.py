@@ -0,0 +1,80 @@
+# Generated by Django 4.2 on 2026-10-18 17:57
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count_follows(apps, schema_editor):
+    User = apps.get_model("user", "User")
+    Follow = apps.get_model("user", "Follow")
+
+    def edges(column):
+        return (
+            Follow.objects.filter(**{column: OuterRef("pk")})
+            .values(column)
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+
+    User.objects.update(
+        follower_count=Coalesce(Subquery(edges("followee")), 0),
+        following_count=Coalesce(Subquery(edges("follower")), 0),
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Turn the auto-created followers through table into the explicit Follow
+    model without touching the existing table, index it for paging both
+    sides of the graph and denormalize the follow counts.
+    """
+
+    dependencies = [
+        ('user', '0004_user_profile_picture_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Follow',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('followee', models.ForeignKey(db_column='from_user_id', on_delete=django.db.models.deletion.CASCADE, related_name='follower_edges', to=settings.AUTH_USER_MODEL)),
+                        ('follower', models.ForeignKey(db_column='to_user_id', on_delete=django.db.models.deletion.CASCADE, related_name='following_edges', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'user_user_followers',
+                        'unique_together': {('followee', 'follower')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='user',
+                    name='followers',
+                    field=models.ManyToManyField(related_name='following', through='user.Follow', through_fields=('followee', 'follower'), to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followee', '-id'], name='follow_followee_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', '-id'], name='follow_follower_id_idx'),
+        ),
+        migrations.RunPython(count_follows, migrations.RunPython.noop),
+    ]
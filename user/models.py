@@ -6,6 +6,7 @@ from django.contrib.auth.models import (
     BaseUserManager,
 )
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils.text import slugify
 from django.utils.translation import gettext as _
 
@@ -56,12 +57,97 @@ class User(AbstractUser):
     username = None
     email = models.EmailField(_("email address"), unique=True)
     followers = models.ManyToManyField(
-        "self", symmetrical=False, related_name="following"
+        "self",
+        symmetrical=False,
+        related_name="following",
+        through="Follow",
+        through_fields=("followee", "follower"),
     )
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
     profile_picture = models.ImageField(
         null=True, blank=True, upload_to=user_profile_picture_file_path
     )
+    profile_picture_renditions = models.JSONField(
+        default=dict, editable=False
+    )
+    # Bumped by follow count changes too.
+    updated_at = models.DateTimeField(auto_now=True)
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
     objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(Lower("email"), name="user_email_lower_idx"),
+        ]
+
+    def refresh_from_db(self, using=None, fields=None):
+        # Users authenticated from a cached snapshot load the rest of their
+        # row on the first deferred field read, not one field at a time.
+        if fields is not None and self.__dict__.pop(
+            "_load_row_on_access", False
+        ):
+            fields = self.get_deferred_fields().union(fields)
+
+        super().refresh_from_db(using, fields)
+
+
+class Follow(models.Model):
+    """`follower` follows `followee`"""
+
+    followee = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="follower_edges",
+        db_column="from_user_id",
+    )
+    follower = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="following_edges",
+        db_column="to_user_id",
+    )
+
+    class Meta:
+        db_table = "user_user_followers"
+        unique_together = ("followee", "follower")
+        indexes = [
+            models.Index(
+                fields=["followee", "-id"], name="follow_followee_id_idx"
+            ),
+            models.Index(
+                fields=["follower", "-id"], name="follow_follower_id_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.follower_id} -> {self.followee_id}"
+
+
+class FollowSuggestion(models.Model):
+    """An account `user` may want to follow, see user/suggestions.py"""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="follow_suggestions"
+    )
+    suggested = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+"
+    )
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "suggested"], name="follow_suggestion_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-score"], name="follow_suggestion_score_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user_id} -> {self.suggested_id} ({self.score:.3f})"
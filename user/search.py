@@ -0,0 +1,23 @@
+from django.db import connections
+from django.db.models.functions import Lower
+
+
+def email_prefix_search(queryset, prefix: str):
+    """
+    Users whose lowercased email starts with `prefix`, ordered by email.
+
+    PostgreSQL answers the LIKE from the pg_trgm GIN index; elsewhere the
+    prefix becomes a range over the `lower(email)` B-tree index.
+    """
+    prefix = prefix.strip().lower()
+    queryset = queryset.annotate(email_lower=Lower("email")).order_by(
+        "email_lower"
+    )
+
+    if connections[queryset.db].vendor == "postgresql":
+        return queryset.filter(email_lower__startswith=prefix)
+
+    upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return queryset.filter(
+        email_lower__gte=prefix, email_lower__lt=upper_bound
+    )
@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from social_media.serializers import ImageRenditionsField, SparseFieldsetMixin
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    profile_picture_renditions = ImageRenditionsField()
 
     class Meta:
         model = get_user_model()
@@ -12,9 +15,11 @@ class UserSerializer(serializers.ModelSerializer):
             "password",
             "is_staff",
             "profile_picture",
-            "following",
+            "profile_picture_renditions",
+            "follower_count",
+            "following_count",
         )
-        read_only_fields = ("is_staff", "following", "liked_posts")
+        read_only_fields = ("is_staff", "follower_count", "following_count")
         extra_kwargs = {
             "password": {"write_only": True, "min_length": 5},
         }
@@ -26,9 +31,35 @@ class UserSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         """Update a user, set the password correctly and return it"""
         password = validated_data.pop("password", None)
-        user = super().update(instance, validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+
+        update_fields = list(validated_data)
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
+            update_fields.append("password")
+
+        # Only write what changed so concurrent counter updates survive,
+        # and the timestamp conditional GETs validate against.
+        if update_fields:
+            update_fields.append("updated_at")
+        instance.save(update_fields=update_fields)
+        return instance
+
+
+class BulkFollowSerializer(serializers.Serializer):
+    users = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=500
+    )
+
 
-        return user
+class FollowSuggestionSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source="suggested_id")
+    email = serializers.EmailField(source="suggested.email")
+    profile_picture = serializers.ImageField(
+        source="suggested.profile_picture"
+    )
+    follower_count = serializers.IntegerField(
+        source="suggested.follower_count"
+    )
+    score = serializers.FloatField()
@@ -0,0 +1,81 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.db import transaction
+from django.dispatch import receiver
+
+from social_media.images import schedule_renditions
+from user.authentication import evict_user
+from user.graph import adjust_follow_counts, adjust_other_follow_counts
+from user.models import Follow, User
+
+
+@receiver(post_save, sender=User)
+def build_profile_picture_renditions(sender, instance, **kwargs):
+    schedule_renditions(
+        instance, "profile_picture", "profile_picture_renditions"
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_authenticated_user(sender, instance, **kwargs):
+    # Again after commit, in case a request cached the row in between.
+    evict_user(instance.pk)
+    transaction.on_commit(lambda: evict_user(instance.pk))
+
+
+def _edges_of(instance, reverse, pk_set=None):
+    """Ids on the other side of the existing edges touched by a change"""
+    if reverse:
+        edges = Follow.objects.filter(follower=instance)
+        column = "followee_id"
+    else:
+        edges = Follow.objects.filter(followee=instance)
+        column = "follower_id"
+
+    if pk_set is not None:
+        edges = edges.filter(**{f"{column}__in": pk_set})
+
+    return list(edges.values_list(column, flat=True))
+
+
+@receiver(m2m_changed, sender=Follow)
+def sync_follow_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep the follow counters right when follows change through the M2M
+    manager. `reverse` means `instance.following` changed, i.e. the
+    instance is the follower.
+    """
+    if action == "pre_remove":
+        instance._unfollowed_ids = _edges_of(instance, reverse, pk_set)
+    elif action == "pre_clear":
+        instance._unfollowed_ids = _edges_of(instance, reverse)
+    elif action == "post_add":
+        adjust_follow_counts(instance.pk, pk_set, reverse, 1)
+    elif action in ("post_remove", "post_clear"):
+        adjust_follow_counts(
+            instance.pk,
+            instance.__dict__.pop("_unfollowed_ids", []),
+            reverse,
+            -1,
+        )
+
+
+@receiver(pre_delete, sender=User)
+def remember_follows(sender, instance, **kwargs):
+    instance._followee_ids = _edges_of(instance, reverse=True)
+    instance._follower_ids = _edges_of(instance, reverse=False)
+
+
+@receiver(post_delete, sender=User)
+def release_follows(sender, instance, **kwargs):
+    adjust_other_follow_counts(
+        instance.__dict__.pop("_followee_ids", []), True, -1
+    )
+    adjust_other_follow_counts(
+        instance.__dict__.pop("_follower_ids", []), False, -1
+    )
@@ -1,3 +1,432 @@
-from django.test import TestCase
+import gzip
+import json
+import math
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import (
+    APIClient,
+    APIRequestFactory,
+    force_authenticate,
+)
+from rest_framework_simplejwt.tokens import AccessToken
+
+from social_media.models import Comment, Hashtag, Post
+from user.graph import follow_users, recount_follows, unfollow_users
+from user.models import FollowSuggestion
+from user.suggestions import FollowGraph, compute_suggestions
+from social_media.tests import QueryBudgetMixin, sample_social_graph
+from user.authentication import (
+    CachedJWTAuthentication,
+    token_cache,
+    user_cache,
+)
+from user.views import (
+    ExportView,
+    TYPEAHEAD_LIMIT,
+    TYPEAHEAD_MAX_AGE,
+    TYPEAHEAD_MAX_LIMIT,
+)
+
+
+class FeedQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.users = sample_social_graph()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def test_feeds(self):
+        for name, budget in (
+            ("user:me-posts", 2),
+            ("user:liked-posts", 2),
+            ("user:following-posts", 3),
+        ):
+            with self.subTest(name), self.assertMaxQueries(budget):
+                response = self.client.get(reverse(name))
+
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.data["results"])
+
+
+class FollowTests(TestCase):
+    def setUp(self):
+        self.user, self.other = (
+            get_user_model().objects.create_user(email, "pass12345")
+            for email in ("user@test.com", "other@test.com")
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("user:follow", args=[self.other.id])
+
+    def test_follow_and_unfollow_are_idempotent(self):
+        for method, following in (
+            ("post", True),
+            ("post", True),
+            ("delete", False),
+            ("delete", False),
+        ):
+            response = getattr(self.client, method)(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["following"], following)
+            self.assertEqual(response.data["follower_count"], int(following))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.following_count, 0)
+
+    def test_bulk_follow_skips_self_and_existing(self):
+        self.client.post(self.url)
+        response = self.client.post(
+            reverse("user:bulk-follow"),
+            {"users": [self.user.id, self.other.id]},
+            format="json",
+        )
+
+        self.assertEqual(response.data, {"following": []})
+
+
+class FollowGraphTests(TestCase):
+    def setUp(self):
+        self.users = get_user_model().objects.bulk_create(
+            get_user_model()(email=f"user{i}@test.com") for i in range(4)
+        )
+        self.user = self.users[0]
+        self.others = [other.id for other in self.users[1:]]
+
+    def counts(self):
+        return list(
+            get_user_model()
+            .objects.order_by("id")
+            .values_list("follower_count", "following_count")
+        )
+
+    def test_follow_and_unfollow_report_only_changes(self):
+        self.assertEqual(follow_users(self.user, self.others), self.others)
+        self.assertEqual(follow_users(self.user, self.others), [])
+        self.assertEqual(
+            unfollow_users(self.user, self.others[:1]), self.others[:1]
+        )
+        self.assertEqual(unfollow_users(self.user, self.others[:1]), [])
+
+    def test_self_follow_is_rejected(self):
+        self.assertEqual(follow_users(self.user, [self.user.id]), [])
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(reverse("user:follow", args=[self.user.id]))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.user.following.exists())
+
+    def test_counters_match_the_follow_table(self):
+        follow_users(self.user, self.others)
+        follow_users(self.users[1], [self.user.id, self.users[2].id])
+        unfollow_users(self.user, [self.users[2].id, self.users[2].id])
+        follow_users(self.users[3], [self.users[3].id, self.users[1].id])
+        counts = self.counts()
+
+        self.assertEqual(counts, [(1, 2), (2, 2), (1, 0), (1, 1)])
+        get_user_model().objects.update(follower_count=9, following_count=9)
+        recount_follows([user.id for user in self.users])
+        self.assertEqual(self.counts(), counts)
+
+    def test_deleting_a_user_only_updates_the_other_side(self):
+        follow_users(self.user, self.others)
+        follow_users(self.users[1], [self.user.id, self.users[2].id])
+
+        with CaptureQueriesContext(connection) as context:
+            self.user.delete()
+
+        self.assertEqual(self.counts(), [(0, 1), (1, 0), (0, 0)])
+        updates = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("UPDATE")
+        ]
+        self.assertEqual(len(updates), 2)
+        self.assertFalse(any("IS NULL" in sql for sql in updates))
+
+
+class TypeaheadTests(TestCase):
+    def setUp(self):
+        emails = [f"ann{i:02}@test.com" for i in range(25)]
+        emails += ["Anna@test.com", "bob@test.com"]
+        get_user_model().objects.bulk_create(
+            get_user_model()(email=email) for email in emails
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.get(email="bob@test.com")
+        )
+        self.url = reverse("user:user-typeahead")
+
+    def emails(self, query):
+        response = self.client.get(self.url + query)
+        return [user["email"] for user in response.data]
+
+    def test_prefix_matches_case_insensitively(self):
+        self.assertEqual(self.emails("?q=ANNA"), ["Anna@test.com"])
+        self.assertEqual(
+            self.emails("?q=ann&limit=3"),
+            ["ann00@test.com", "ann01@test.com", "ann02@test.com"],
+        )
+        self.assertEqual(
+            self.emails("?q=ann2"), [f"ann2{i}@test.com" for i in range(5)]
+        )
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(len(self.emails("?q=a")), TYPEAHEAD_LIMIT)
+        self.assertEqual(len(self.emails("?q=a&limit=x")), TYPEAHEAD_LIMIT)
+        self.assertEqual(len(self.emails("?q=a&limit=0")), 1)
+        self.assertEqual(
+            len(self.emails("?q=a&limit=1000")), TYPEAHEAD_MAX_LIMIT
+        )
+
+    def test_empty_query_is_answered_without_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url + "?q=%20")
+
+        self.assertEqual(response.data, [])
+        self.assertEqual(
+            response["Cache-Control"], f"max-age={TYPEAHEAD_MAX_AGE}"
+        )
+
+
+THROTTLE_RATES = {"follow": "2/min", "register_ip": "1/min"}
+
+
+@override_settings(
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": THROTTLE_RATES,
+    }
+)
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.other = (
+            get_user_model().objects.create_user(email, "pass12345")
+            for email in ("user@test.com", "other@test.com")
+        )
+        self.client = APIClient()
+
+    def test_follow_is_limited_per_user(self):
+        self.client.force_authenticate(self.user)
+        url = reverse("user:follow", args=[self.other.id])
+        statuses = [self.client.post(url).status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 429])
+        response = self.client.post(url)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertEqual(response["RateLimit-Limit"], "2")
+        self.assertEqual(response["RateLimit-Remaining"], "0")
+
+        self.client.force_authenticate(self.other)
+        url = reverse("user:follow", args=[self.user.id])
+        self.assertEqual(self.client.post(url).status_code, 200)
+
+    def test_register_is_limited_per_ip(self):
+        url = reverse("user:create")
+        first = self.client.post(
+            url, {"email": "new1@test.com", "password": "pass12345"}
+        )
+        second = self.client.post(
+            url, {"email": "new2@test.com", "password": "pass12345"}
+        )
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first["RateLimit-Remaining"], "0")
+        self.assertEqual(second.status_code, 429)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        user_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "staff@test.com", "pass12345", is_staff=True
+        )
+        self.request = APIRequestFactory().get(
+            "/", HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+        self.authentication = CachedJWTAuthentication()
+
+    def test_cached_user_loads_its_row_lazily(self):
+        self.authentication.authenticate(self.request)
+
+        with self.assertNumQueries(0):
+            user, _ = self.authentication.authenticate(self.request)
+            self.assertTrue(user.is_authenticated)
+            self.assertTrue(user.is_staff)
+            self.assertEqual(user, self.user)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, "staff@test.com")
+            self.assertEqual(user.updated_at, self.user.updated_at)
+
+    def test_saving_a_user_evicts_its_snapshot(self):
+        self.authentication.authenticate(self.request)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate(self.request)
+
+    def test_manage_user_view(self):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=self.request.META["HTTP_AUTHORIZATION"]
+        )
+        client.get(reverse("user:manage"))
+
+        with self.assertNumQueries(1):
+            response = client.get(reverse("user:manage"))
+
+        self.assertEqual(response.data["email"], "staff@test.com")
+
+
+class ConditionalUserTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "user@test.com", "pass12345"
+        )
+        get_user_model().objects.filter(id=self.user.id).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_update_invalidates_previous_validators(self):
+        url = reverse("user:manage")
+        response = self.client.get(url)
+        headers = {
+            "If-None-Match": response["ETag"],
+            "If-Modified-Since": response["Last-Modified"],
+        }
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 304)
+
+        self.client.patch(url, {"email": "renamed@test.com"})
+        for url in (url, reverse("user:user-detail", args=[self.user.id])):
+            response = self.client.get(url, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["email"], "renamed@test.com")
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user, self.other = (
+            get_user_model().objects.create_user(email, "pass12345")
+            for email in ("user@test.com", "other@test.com")
+        )
+        tag = Hashtag.objects.create(name="tag")
+        for index in range(3):
+            post = Post.objects.create(
+                title=f"post {index}", content="c", user=self.user
+            )
+            post.hashtags.add(tag)
+        Comment.objects.create(user=self.user, post=post, content="hi")
+        post.liked_by.add(self.user)
+        self.user.following.add(self.other)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def read(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_export_streams_every_record(self):
+        response = self.client.get(reverse("user:export"))
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        records = [
+            json.loads(line) for line in self.read(response).splitlines()
+        ]
+        self.assertEqual(
+            [record["type"] for record in records],
+            ["user"] + ["post"] * 3 + ["comment", "like", "following"],
+        )
+        self.assertEqual(records[0]["following_count"], 1)
+        self.assertEqual(records[1]["hashtags"], ["tag"])
+        self.assertEqual(records[-1]["email"], "other@test.com")
+
+    def test_gzip_when_accepted(self):
+        plain = self.read(self.client.get(reverse("user:export")))
+        response = self.client.get(
+            reverse("user:export"), HTTP_ACCEPT_ENCODING="gzip, br"
+        )
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(self.read(response)), plain)
+
+
+    def test_asgi_requests_get_an_async_stream(self):
+        request = AsyncRequestFactory().get(reverse("user:export"))
+        force_authenticate(request, self.user)
+        response = ExportView.as_view()(request)
+
+        async def read():
+            return b"".join([part async for part in response])
+
+        self.assertTrue(response.is_async)
+        plain = self.read(self.client.get(reverse("user:export")))
+        self.assertEqual(async_to_sync(read)(), plain)
+
+
+class FollowSuggestionTests(TestCase):
+    def setUp(self):
+        self.me, a, b, self.c, self.d = (
+            get_user_model().objects.create_user(f"{name}@test.com", "pass")
+            for name in ("me", "a", "b", "c", "d")
+        )
+        self.me.following.add(a, b)
+        a.following.add(self.c, self.d)
+        b.following.add(self.c)
+        self.c.following.add(self.me)
+
+    def suggestions(self, user):
+        return list(
+            FollowSuggestion.objects.filter(user=user)
+            .order_by("-score")
+            .values_list("suggested", "score")
+        )
+
+    def test_scores(self):
+        compute_suggestions(method="adamic_adar", batch_size=2)
+        (first, first_score), (second, second_score) = self.suggestions(
+            self.me
+        )
+        self.assertEqual((first, second), (self.c.id, self.d.id))
+        self.assertAlmostEqual(first_score, 1 / math.log(3) + 1 / math.log(2))
+        self.assertAlmostEqual(second_score, 1 / math.log(3))
+
+        compute_suggestions(method="jaccard")
+        self.assertEqual(
+            self.suggestions(self.me), [(self.c.id, 1.0), (self.d.id, 0.5)]
+        )
+
+    def test_edges_of_users_created_since_the_user_read_are_skipped(self):
+        graph = FollowGraph([1, 2], [(1, 2), (1, 3), (3, 2)])
+
+        self.assertEqual(list(graph.following_of(0)), [1])
+        self.assertEqual(graph.follower_count(1), 1)
+
+    def test_endpoint_is_one_read_without_accounts_followed_since(self):
+        compute_suggestions()
+        self.me.following.add(self.c)
+        client = APIClient()
+        client.force_authenticate(self.me)
+
+        with self.assertNumQueries(1):
+            response = client.get(reverse("user:suggestions"))
+
+        self.assertEqual(
+            [suggestion["id"] for suggestion in response.data], [self.d.id]
+        )
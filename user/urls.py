@@ -6,10 +6,14 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 
+from user import async_views
 from user.views import (
     CreateUserView,
+    ExportView,
+    FollowSuggestionsView,
     ManageUserView,
     UserViewSet,
+    bulk_follow,
     follow,
     unfollow,
     FollowersListView,
@@ -28,6 +32,7 @@ urlpatterns = [
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
     path("me/", ManageUserView.as_view(), name="manage"),
+    path("me/export/", ExportView.as_view(), name="export"),
     path("me/posts/", UserPostsView.as_view(), name="me-posts"),
     path("me/liked_posts/", LikedPostsView.as_view(), name="liked-posts"),
     path(
@@ -35,6 +40,22 @@ urlpatterns = [
         FollowingPostsView.as_view(),
         name="following-posts",
     ),
+    path(
+        "me/posts/async/",
+        async_views.user_posts,
+        name="me-posts-async",
+    ),
+    path(
+        "me/liked_posts/async/",
+        async_views.liked_posts,
+        name="liked-posts-async",
+    ),
+    path(
+        "me/following_posts/async/",
+        async_views.following_posts,
+        name="following-posts-async",
+    ),
+    path("follow/", bulk_follow, name="bulk-follow"),
     path(
         "follow/<int:user_id>/",
         follow,
@@ -47,6 +68,9 @@ urlpatterns = [
     ),
     path("following/", FollowingListView.as_view(), name="following-list"),
     path("followers/", FollowersListView.as_view(), name="followers-list"),
+    path(
+        "suggestions/", FollowSuggestionsView.as_view(), name="suggestions"
+    ),
     path("", include(router.urls)),
 ]
 
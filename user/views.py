@@ -1,54 +1,117 @@
+import re
+from functools import cached_property
+
 from django.contrib.auth import get_user_model
-from django.http import HttpResponseRedirect
-from django.shortcuts import get_object_or_404
-from django.urls import reverse
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F
+from django.core.files.storage import default_storage
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import generics, viewsets, mixins
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
-
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from Social_Media_API.db_routing import ReplicaReadMixin
+from Social_Media_API.throttling import throttle_scope
+from social_media.conditional import (
+    ConditionalGetMixin,
+    ConditionalPageMixin,
+    instance_etag,
+    instance_validators,
+)
 from social_media.models import Post
+from social_media.pagination import (
+    FollowCursorPagination,
+    PostCursorPagination,
+)
+from social_media.rows import PostValuesListMixin
+from social_media.timeline import timeline_posts
 from social_media.serializers import PostListSerializer
-from user.serializers import UserSerializer
+from user.export import aiterate, export_stream
+from user.graph import follow_users, following_ids, unfollow_users
+from user.models import FollowSuggestion
+from user.search import email_prefix_search
+from user.serializers import (
+    BulkFollowSerializer,
+    FollowSuggestionSerializer,
+    UserSerializer,
+)
+from user.suggestions import TOP_K
 
 User = get_user_model()
 
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_MAX_LIMIT = 20
+TYPEAHEAD_MAX_AGE = 60
+IS_FOLLOWING_MAX_IDS = 100
+
+SUGGESTIONS_LIMIT = 10
+
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
 
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
+    throttle_scope = "register"
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
+    @cached_property
+    def user(self):
+        # Authentication may only have a snapshot of the user: load the row
+        # once for both the validators and the response.
+        return User.objects.filter(id=self.request.user.id).first()
+
+    def get_validators(self):
+        return instance_etag(self.user), self.user.updated_at
+
+    def retrieve(self, request, *args, **kwargs):
+        self.conditional_validators = self.get_validators()
+        return super().retrieve(request, *args, **kwargs)
+
     def get_object(self):
-        return (
-            User.objects.filter(id=self.request.user.id)
-            .prefetch_related("following")
-            .first()
-        )
+        return self.user
 
 
 class UserViewSet(
+    ConditionalGetMixin,
+    ReplicaReadMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet,
 ):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    replica_actions = ("list", "retrieve", "typeahead")
 
     def get_queryset(self):
         email = self.request.query_params.get("email")
-        queryset = self.queryset.prefetch_related("following")
+        queryset = self.queryset
 
         if email:
             queryset = queryset.filter(email__icontains=email)
 
         return queryset.distinct()
 
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        self.conditional_validators = (
+            instance_etag(instance),
+            instance.updated_at,
+        )
+        return Response(self.get_serializer(instance).data)
+
+    def retrieve_validators(self):
+        return instance_validators(User.objects.all(), self.kwargs["pk"])
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -63,35 +126,149 @@ class UserViewSet(
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "q",
+                type={"type": "string"},
+                description="Email prefix, example: ?q=abc",
+            ),
+            OpenApiParameter(
+                "limit",
+                type={"type": "number"},
+                description=(
+                    f"Maximum number of users, at most {TYPEAHEAD_MAX_LIMIT}"
+                ),
+            ),
+        ]
+    )
+    @action(detail=False, methods=["get"])
+    def typeahead(self, request):
+        """Lightweight users whose email starts with `q`, for autocomplete"""
+        query = request.query_params.get("q", "").strip()
+        try:
+            limit = int(request.query_params.get("limit", TYPEAHEAD_LIMIT))
+        except ValueError:
+            limit = TYPEAHEAD_LIMIT
+        limit = max(1, min(limit, TYPEAHEAD_MAX_LIMIT))
+
+        users = []
+        if query:
+            rows = email_prefix_search(User.objects.all(), query).values(
+                "id", "email", "profile_picture"
+            )
+            users = [
+                {
+                    "id": row["id"],
+                    "email": row["email"],
+                    "profile_picture": (
+                        request.build_absolute_uri(
+                            default_storage.url(row["profile_picture"])
+                        )
+                        if row["profile_picture"]
+                        else None
+                    ),
+                }
+                for row in rows[:limit]
+            ]
+
+        response = Response(users)
+        patch_cache_control(response, max_age=TYPEAHEAD_MAX_AGE)
+        return response
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ids",
+                type={"type": "list", "items": {"type": "number"}},
+                description=(
+                    f"Up to {IS_FOLLOWING_MAX_IDS} user ids, "
+                    "example: ?ids=1,2,3"
+                ),
+            )
+        ]
+    )
+    @action(
+        detail=False, methods=["get"], permission_classes=[IsAuthenticated]
+    )
+    def is_following(self, request):
+        """Whether the current user follows each of the given users"""
+        ids = [
+            int(user_id)
+            for user_id in request.query_params.get("ids", "").split(",")
+            if user_id.strip().isdigit()
+        ][:IS_FOLLOWING_MAX_IDS]
+        followed = following_ids(request.user.id, ids)
+
+        return Response({user_id: user_id in followed for user_id in ids})
+
+
+def _follow_state(user_id, following, changed):
+    """The follow state of one user after a write, in a single query"""
+    follower_count = (
+        User.objects.filter(id=user_id)
+        .values_list("follower_count", flat=True)
+        .first()
+    )
+    if follower_count is None:
+        raise NotFound("User not found.")
+
+    return Response(
+        {
+            "user": user_id,
+            "following": following,
+            "changed": bool(changed),
+            "follower_count": follower_count,
+        }
+    )
+
 
-@api_view(["GET"])
+@throttle_scope("follow")
+@extend_schema(request=None)
+@api_view(["POST", "DELETE"])
 @permission_classes([IsAuthenticated])
 def follow(request, user_id):
-    """Add user_to_follow to current user's following"""
-    user_to_follow = get_object_or_404(User, id=user_id)
+    """
+    POST follows the user, DELETE unfollows them. Both are idempotent and
+    return the resulting follow state.
+    """
+    if user_id == request.user.id:
+        raise ValidationError({"user": "You cannot follow yourself."})
 
-    user = request.user
+    following = request.method == "POST"
+    if following:
+        changed = follow_users(request.user, [user_id])
+    else:
+        changed = unfollow_users(request.user, [user_id])
 
-    user.following.add(user_to_follow)
-    user.save()
+    return _follow_state(user_id, following, changed)
 
-    manage_url = reverse("user:manage")
-    return HttpResponseRedirect(manage_url)
 
-
-@api_view(["GET"])
+@throttle_scope("follow")
+@extend_schema(request=None)
+@api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def unfollow(request, user_id):
-    """Remove user_to_unfollow from current user's following"""
-    user_to_follow = get_object_or_404(User, id=user_id)
+    """Same as DELETE on the follow endpoint, for clients without DELETE"""
+    changed = unfollow_users(request.user, [user_id])
+    return _follow_state(user_id, False, changed)
+
 
-    user = request.user
+@throttle_scope("follow")
+@extend_schema(request=BulkFollowSerializer)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_follow(request):
+    """
+    Follow many users in one transaction.
+    Returns the ids of the users that were not followed before.
+    """
+    serializer = BulkFollowSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
 
-    user.following.remove(user_to_follow)
-    user.save()
+    user_ids = serializer.validated_data["users"]
 
-    manage_url = reverse("user:manage")
-    return HttpResponseRedirect(manage_url)
+    return Response({"following": follow_users(request.user, user_ids)})
 
 
 class FollowingListView(generics.ListAPIView):
@@ -100,10 +277,13 @@ class FollowingListView(generics.ListAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = FollowCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        return user.following.all().prefetch_related("following")
+        return User.objects.filter(follower_edges__follower=user).annotate(
+            edge_id=F("follower_edges__id")
+        )
 
 
 class FollowersListView(generics.ListAPIView):
@@ -112,53 +292,146 @@ class FollowersListView(generics.ListAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = FollowCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        return User.objects.filter(following=user)
+        return User.objects.filter(following_edges__followee=user).annotate(
+            edge_id=F("following_edges__id")
+        )
 
 
-class UserPostsView(generics.ListAPIView):
+class UserPostsView(
+    ConditionalPageMixin, PostValuesListMixin, generics.ListAPIView
+):
     """Retrieve all the posts of the user"""
 
     serializer_class = PostListSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = PostCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        user_posts = Post.objects.filter(user=user).prefetch_related(
-            "hashtags", "liked_by"
+        user_posts = (
+            Post.objects.filter(user=user)
+            .with_liked_by_me(user)
+            .prefetch_related("hashtags")
         )
 
         return user_posts
 
 
-class FollowingPostsView(generics.ListAPIView):
+class FollowingPostsView(
+    ConditionalPageMixin, PostValuesListMixin, generics.ListAPIView
+):
     """Posts of all users that the current user is following"""
 
     serializer_class = PostListSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = PostCursorPagination
 
-    def get_queryset(self):
-        current_user = self.request.user
-        following_users = current_user.following.all()
-        following_posts = Post.objects.filter(
-            user__in=following_users
-        ).prefetch_related("hashtags", "liked_by")
+    @cached_property
+    def timeline(self):
+        # Looked up once for both the validators and the page.
+        return timeline_posts(self.request.user)
 
-        return following_posts
+    def get_queryset(self):
+        user = self.request.user
+        return (
+            self.timeline.with_liked_by_me(user).prefetch_related("hashtags")
+        )
 
 
-class LikedPostsView(generics.ListAPIView):
+class LikedPostsView(
+    ConditionalPageMixin, PostValuesListMixin, generics.ListAPIView
+):
     """Retrieve all the posts that the user has liked"""
 
     serializer_class = PostListSerializer
     permission_classes = (IsAuthenticated,)
+    pagination_class = PostCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        liked_posts = user.liked_posts.all().prefetch_related(
-            "hashtags", "liked_by"
+        liked_posts = (
+            user.liked_posts.all()
+            .with_liked_by_me(user)
+            .prefetch_related("hashtags")
         )
 
         return liked_posts
+
+
+class FollowSuggestionsView(generics.ListAPIView):
+    """
+    Accounts the current user may want to follow, best first, from the
+    precomputed suggestions less the accounts followed since.
+    """
+
+    serializer_class = FollowSuggestionSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = None
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "limit",
+                type={"type": "number"},
+                description=f"Maximum number of accounts, at most {TOP_K}",
+            )
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        try:
+            limit = int(
+                self.request.query_params.get("limit", SUGGESTIONS_LIMIT)
+            )
+        except ValueError:
+            limit = SUGGESTIONS_LIMIT
+        limit = max(1, min(limit, TOP_K))
+
+        user = self.request.user
+        return (
+            FollowSuggestion.objects.filter(user_id=user.id)
+            .exclude(suggested__follower_edges__follower_id=user.id)
+            .select_related("suggested")
+            .only(
+                "score",
+                "suggested__email",
+                "suggested__profile_picture",
+                "suggested__follower_count",
+            )
+            .order_by("-score")[:limit]
+        )
+
+
+class ExportView(APIView):
+    """
+    Stream the posts, comments, likes and follows of the current user as
+    newline-delimited JSON, gzipped when the client accepts it.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = "export"
+
+    @extend_schema(responses={(200, "application/x-ndjson"): OpenApiTypes.STR})
+    def get(self, request):
+        gzip = bool(
+            ACCEPTS_GZIP.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        )
+        stream = export_stream(request.user, request, gzip=gzip)
+        if isinstance(request._request, ASGIRequest):
+            stream = aiterate(stream)
+        response = StreamingHttpResponse(
+            stream, content_type="application/x-ndjson"
+        )
+        if gzip:
+            response["Content-Encoding"] = "gzip"
+        patch_vary_headers(response, ("Accept-Encoding",))
+        response["Content-Disposition"] = (
+            f'attachment; filename="account-{request.user.id}.ndjson"'
+        )
+        return response